@@ -1,9 +1,49 @@
+import hashlib
 import os
 import sys
-import librosa
+import soundfile as sf
+from utils.audio_processor import load_audio
 from utils.feature_extractor import FeatureExtractor
+from utils.similarity import SimilarityMatcher
+from utils.streaming import MelodyStream
+from utils.fingerprint import stamp_features
 from models.database import add_song
 
+# Longer files (live sets, medleys) are streamed instead of decoded whole
+STREAMING_MIN_SECONDS = 600
+
+def extract_song_features(audio_path, extractor, matcher=None, segment=None, source_hash=None):
+    """
+    Ingest-time features for one audio file: full profile plus the
+    match-ready melody, stamped with the extractor fingerprint and the
+    source hash in features['meta']
+    segment: optional (start, end) in seconds
+    source_hash: content_hash(audio_path) if the caller already has it
+    Returns (features, duration in seconds)
+    """
+    duration = stream_duration(audio_path)
+    
+    if segment is not None:
+        y, sr = load_audio(audio_path, sr=extractor.sr)
+        y = y[int(segment[0] * sr):int(segment[1] * sr)]
+        duration = len(y) / sr
+        features = extractor.extract_features(y, sr=sr)
+    elif duration is not None and duration >= STREAMING_MIN_SECONDS:
+        # Bounded memory: melody only, block by block
+        features = MelodyStream(sr=extractor.sr).extract_melody(audio_path)
+    else:
+        # Decode once: the same samples give duration and features
+        y, sr = load_audio(audio_path, sr=extractor.sr)
+        duration = len(y) / sr
+        
+        # Extract features
+        features = extractor.extract_features(y, sr=sr)
+    
+    # Store match-ready melody (intervals, contour, PAA pyramid) next to raw pitch
+    features.update((matcher or SimilarityMatcher()).prepare(features))
+    stamp_features(features, extractor, source_hash or content_hash(audio_path))
+    return features, duration
+
 def process_and_add_song(audio_path, title, artist):
     """
     Process an audio file and add it to the database
@@ -11,13 +51,8 @@ def process_and_add_song(audio_path, title, artist):
     try:
         print(f"Processing: {title} by {artist}")
         
-        # Extract features
         extractor = FeatureExtractor(sr=16000)
-        features = extractor.extract_features(audio_path)
-        
-        # Get duration
-        y, sr = librosa.load(audio_path, sr=16000)
-        duration = librosa.get_duration(y=y, sr=sr)
+        features, duration = extract_song_features(audio_path, extractor)
         
         # Save features
         feature_filename = f"song_{title.replace(' ', '_').lower()}.npy"
@@ -29,7 +64,10 @@ def process_and_add_song(audio_path, title, artist):
             title=title,
             artist=artist,
             duration=duration,
-            feature_path=feature_path
+            feature_path=feature_path,
+            content_hash=features['meta']['content_hash'],
+            source_path=os.path.abspath(audio_path),
+            feature_fingerprint=features['meta']['fingerprint']
         )
         
         print(f"✅ Added song ID {song_id}: {title}")
@@ -39,6 +77,21 @@ def process_and_add_song(audio_path, title, artist):
         print(f"❌ Error processing {title}: {str(e)}")
         return None
 
+def content_hash(audio_path, block_size=1 << 20):
+    """sha1 of the file bytes: the same recording under any name or path"""
+    digest = hashlib.sha1()
+    with open(audio_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def stream_duration(audio_path):
+    """Duration from the file header, None if soundfile can't stream it"""
+    try:
+        return sf.info(audio_path).duration
+    except Exception:
+        return None
+
 if __name__ == "__main__":
     # Example usage
     if len(sys.argv) < 4:
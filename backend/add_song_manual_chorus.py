@@ -1,9 +1,11 @@
 import os
 import sys
-import librosa
-import soundfile as sf
 import numpy as np
+from utils.audio_processor import load_audio
 from utils.feature_extractor import FeatureExtractor
+from utils.similarity import SimilarityMatcher
+from add_song import content_hash
+from utils.fingerprint import stamp_features
 from models.database import add_song
 
 def extract_chorus_manual(audio_path, title, artist, start_sec, end_sec):
@@ -17,7 +19,7 @@ def extract_chorus_manual(audio_path, title, artist, start_sec, end_sec):
         print("="*60)
         
         # Load audio
-        y_full, sr = librosa.load(audio_path, sr=16000)
+        y_full, sr = load_audio(audio_path, sr=16000)
         
         # Extract section
         start_sample = int(start_sec * sr)
@@ -27,14 +29,15 @@ def extract_chorus_manual(audio_path, title, artist, start_sec, end_sec):
         duration = (end_sec - start_sec)
         print(f"Extracted: {duration}s")
         
-        # Save temporary file
-        temp_file = "temp_section.wav"
-        sf.write(temp_file, y_section, sr)
-        
-        # Extract features
+        # Extract features straight from the slice
         print("🎵 Extracting features...")
         extractor = FeatureExtractor(sr=16000)
-        features = extractor.extract_features(temp_file)
+        features = extractor.extract_features(y_section, sr=sr)
+        
+        # Store match-ready melody (intervals, contour, PAA pyramid) next to raw pitch
+        features.update(SimilarityMatcher().prepare(features))
+        source_hash = content_hash(audio_path)
+        fingerprint = stamp_features(features, extractor, source_hash)
         
         # Check pitch
         voiced_frames = np.sum(features['pitch'] > 0)
@@ -51,11 +54,14 @@ def extract_chorus_manual(audio_path, title, artist, start_sec, end_sec):
             title=title,
             artist=artist,
             duration=duration,
-            feature_path=feature_path
+            feature_path=feature_path,
+            content_hash=source_hash,
+            source_path=os.path.abspath(audio_path),
+            segment_start=start_sec,
+            segment_end=end_sec,
+            feature_fingerprint=fingerprint
         )
         
-        os.remove(temp_file)
-        
         print(f"✅ Added song ID {song_id}")
         print("="*60)
         return song_id
@@ -23,4 +23,11 @@ def create_app():
     from app.routes import api
     app.register_blueprint(api, url_prefix='/api')
     
+    # Drop each request thread's database session when the request ends
+    from models.database import Session
+    
+    @app.teardown_appcontext
+    def remove_session(exception=None):
+        Session.remove()
+    
     return app
\ No newline at end of file
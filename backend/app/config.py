@@ -6,4 +6,28 @@ class Config:
     ALLOWED_EXTENSIONS = {'wav', 'mp3', 'ogg', 'm4a'}
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     SONG_FEATURES_FOLDER = 'song_features'
-    DATABASE_URI = 'sqlite:///database/songs.db'
\ No newline at end of file
+    DATABASE_URI = 'sqlite:///database/songs.db'
+    # 'global' for chorus crops, 'subsequence' for full-length reference tracks,
+    # 'notes' for global matching on note events (much shorter sequences)
+    MATCH_MODE = os.environ.get('MATCH_MODE', 'global')
+    # Pitch tracker for hums: 'pyin', 'pyin_hum', 'yin' or 'autocorr'
+    # (see benchmark_pitch_trackers.py for speed / accuracy)
+    QUERY_PITCH_TRACKER = os.environ.get('QUERY_PITCH_TRACKER', 'pyin')
+    # n-gram candidate retrieval: only the top NGRAM_CANDIDATES songs go to
+    # DTW, once the catalog has more than NGRAM_MIN_CATALOG songs
+    NGRAM_MIN_CATALOG = 500
+    NGRAM_CANDIDATES = 200
+    # Embedding ANN index (built by build_ann_index.py); when the file exists
+    # only the ANN_CANDIDATES nearest songs (plus unindexed ones) go to DTW
+    ANN_INDEX_PATH = os.path.join('database', 'ann_index.npz')
+    ANN_CANDIDATES = 100
+    # Memory-mapped columnar catalog (built by build_catalog.py); songs in it
+    # are read from the shared mapping instead of their own .npy file
+    CATALOG_PATH = os.path.join('database', 'catalog')
+    # > 0: scan the full catalog on a process pool instead ('global' / 'notes')
+    PARALLEL_WORKERS = int(os.environ.get('PARALLEL_WORKERS', 0))
+    # > 0: coarse-to-fine search keeping this fraction at each PAA level
+    COARSE_TO_FINE_RATIO = float(os.environ.get('COARSE_TO_FINE_RATIO', 0))
+    # Most segments stored per song (extract_chorus.py); the search keeps
+    # this many times top-5 so segment duplicates can be collapsed
+    SEGMENTS_PER_SONG = 3
\ No newline at end of file
@@ -1,21 +1,125 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 import os
-import librosa
-import soundfile as sf
-from werkzeug.utils import secure_filename
+from utils.decoder import decode_audio, DecodeError
 from utils.feature_extractor import FeatureExtractor
-from utils.similarity import SimilarityMatcher
-from models.database import get_all_songs, get_song_by_id
+from utils.similarity import SimilarityMatcher, GLOBAL_MODES
+from utils.search import CascadeSearch, CoarseToFineSearch
+from utils.ngram_index import NGramIndex
+from utils.parallel_search import ParallelMatcher
+from utils.embedding import melody_embedding
+from utils.ann_index import IVFIndex
+from utils.catalog import song_source, source_key
+from models.database import get_song_by_id
+from app.snapshot import get_snapshot
 import numpy as np
+import atexit
+import threading
 
 api = Blueprint('api', __name__)
 
-UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'wav', 'mp3', 'ogg', 'm4a', 'webm'}
 
+# Candidate retrieval index, rebuilt when the catalog snapshot changes
+# (songs added / deleted / re-extracted) or the match mode does
+_ngram_cache = {'version': None, 'mode': None, 'index': None}
+
+# Embedding ANN index, reloaded when the file on disk changes
+_ann_cache = {'path': None, 'mtime': None, 'index': None}
+
+# Process-pool matcher over the full catalog, same invalidation; the lock
+# guards the cache and the in-flight search count of every live matcher
+# (a replaced matcher is closed by its last running search)
+_parallel_cache = {'version': None, 'mode': None, 'matcher': None}
+_parallel_users = {}
+_parallel_lock = threading.Lock()
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def best_per_song(matches, top_k=5):
+    """Keep the best-scoring segment of each song (title + artist)"""
+    seen = set()
+    unique = []
+    for song, total_score, individual_scores in matches:
+        key = (song.title.lower(), song.artist.lower())
+        if key not in seen:
+            seen.add(key)
+            unique.append((song, total_score, individual_scores))
+    return unique[:top_k]
+
+def get_ngram_index(catalog, matcher, version):
+    """
+    Melodic n-gram index over the current catalog (cached per process)
+    version: the catalog snapshot's version the catalog came from
+    """
+    if _ngram_cache['version'] != version or _ngram_cache['mode'] != matcher.mode:
+        index = NGramIndex()
+        for song, features in catalog:
+            index.add(song.id, matcher.prepare(features))
+        _ngram_cache['version'] = version
+        _ngram_cache['mode'] = matcher.mode
+        _ngram_cache['index'] = index
+    
+    return _ngram_cache['index']
+
+def get_ann_index(path):
+    """Persisted IVF index of melody embeddings, or None if not built"""
+    if not path or not os.path.exists(path):
+        return None
+    
+    mtime = os.path.getmtime(path)
+    if _ann_cache['path'] != path or _ann_cache['mtime'] != mtime:
+        _ann_cache['index'] = IVFIndex.load(path)
+        _ann_cache['path'] = path
+        _ann_cache['mtime'] = mtime
+    
+    return _ann_cache['index']
+
+def acquire_parallel_matcher(catalog, workers, version, mode='global'):
+    """
+    Shared-memory process-pool matcher over the current catalog, held
+    until release_parallel_matcher (it isn't closed while in use)
+    version: the catalog snapshot's version the catalog came from
+    """
+    with _parallel_lock:
+        if _parallel_cache['version'] != version or _parallel_cache['mode'] != mode:
+            old = _parallel_cache['matcher']
+            _parallel_cache['matcher'] = ParallelMatcher(
+                [(song, features) for song, features in catalog],
+                workers=workers,
+                mode=mode
+            )
+            _parallel_cache['version'] = version
+            _parallel_cache['mode'] = mode
+            _parallel_users[_parallel_cache['matcher']] = 0
+            
+            # Searches still running on the old one close it when they finish
+            if old is not None and _parallel_users[old] == 0:
+                del _parallel_users[old]
+                old.close()
+        
+        matcher = _parallel_cache['matcher']
+        _parallel_users[matcher] += 1
+        return matcher
+
+def release_parallel_matcher(matcher):
+    """End one search on matcher; closes it if it was replaced meanwhile"""
+    with _parallel_lock:
+        _parallel_users[matcher] -= 1
+        if _parallel_users[matcher] == 0 and matcher is not _parallel_cache['matcher']:
+            del _parallel_users[matcher]
+            matcher.close()
+
+@atexit.register
+def close_parallel_matcher():
+    """Stop pool workers and free shared memory of every matcher"""
+    with _parallel_lock:
+        for matcher in list(_parallel_users):
+            matcher.close()
+        _parallel_users.clear()
+        _parallel_cache['matcher'] = None
+        _parallel_cache['version'] = None
+
 @api.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -25,13 +129,15 @@ def health_check():
 def get_songs():
     """Get all songs in database"""
     try:
-        songs = get_all_songs()
+        songs = get_snapshot(current_app.config.get('CATALOG_PATH')).songs()
         songs_list = [
             {
                 'id': song.id,
                 'title': song.title,
                 'artist': song.artist,
-                'duration': song.duration
+                'duration': song.duration,
+                'segment_start': song.segment_start,
+                'segment_end': song.segment_end
             }
             for song in songs
         ]
@@ -65,150 +171,160 @@ def upload_humming():
         print(f"📁 Original filename: {file.filename}")
         print(f"📁 Content type: {file.content_type}")
         
-        # Save uploaded file with original extension
-        filename = secure_filename(file.filename)
-        if not filename:
-            filename = "recording.webm"  # Default for browser recordings
-        
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
-        
-        file_size = os.path.getsize(filepath)
-        print(f"✅ File saved: {filepath} ({file_size} bytes)")
-        
-        # Always convert to WAV for processing
-        wav_path = os.path.join(UPLOAD_FOLDER, "processed_audio.wav")
-        
-        print(f"🔄 Converting to WAV...")
+        # Decode the upload straight from memory (nothing written to disk)
+        data = file.read()
+        print(f"✅ Received {len(data)} bytes")
+        print(f"🔄 Decoding audio...")
         
         try:
-            # Method 1: Try pydub with FFmpeg (best for webm/ogg/mp3)
-            from pydub import AudioSegment
+            y, sr = decode_audio(data, sr=16000)
+            print(f"   ✅ Decoded {len(y) / sr:.1f}s of audio")
+        except DecodeError as e:
+            print(f"\n{'='*60}")
+            print("❌ AUDIO CONVERSION FAILED")
+            print("="*60)
+            print("FFmpeg might not be properly configured.")
+            print(f"Error details: {e}")
+            print("="*60 + "\n")
             
-            print("   Trying pydub conversion...")
-            audio = AudioSegment.from_file(filepath)
-            audio = audio.set_frame_rate(16000).set_channels(1)
-            audio.export(wav_path, format='wav')
-            print(f"   ✅ Converted with pydub")
-            
-        except Exception as e1:
-            print(f"   ⚠️ Pydub failed: {e1}")
-            
-            try:
-                # Method 2: Try librosa (fallback)
-                print("   Trying librosa conversion...")
-                y, sr = librosa.load(filepath, sr=16000, mono=True)
-                sf.write(wav_path, y, sr)
-                print(f"   ✅ Converted with librosa")
-                
-            except Exception as e2:
-                print(f"   ❌ Librosa also failed: {e2}")
-                print(f"\n{'='*60}")
-                print("❌ AUDIO CONVERSION FAILED")
-                print("="*60)
-                print("FFmpeg might not be properly configured.")
-                print("Error details:")
-                print(f"  Pydub error: {e1}")
-                print(f"  Librosa error: {e2}")
-                print("="*60 + "\n")
-                
-                # Clean up
-                try:
-                    os.remove(filepath)
-                except:
-                    pass
-                
-                return jsonify({
-                    'error': 'Audio conversion failed. Please check server logs.'
-                }), 500
-        
-        # Clean up original file
-        try:
-            os.remove(filepath)
-        except:
-            pass
-        
-        filepath = wav_path
+            return jsonify({
+                'error': 'Audio conversion failed. Please check server logs.'
+            }), 500
         
         # Extract features from humming
         print(f"🎵 Extracting features...")
-        extractor = FeatureExtractor(sr=16000)
+        extractor = FeatureExtractor(
+            sr=16000,
+            pitch_tracker=current_app.config.get('QUERY_PITCH_TRACKER', 'pyin')
+        )
         
         try:
-            humming_features = extractor.extract_features(filepath)
+            # Matching only uses pitch: skip MFCC/Chroma/centroid on queries
+            humming_features = extractor.extract_features(y, profile='melody', sr=sr)
             print(f"✅ Features extracted successfully")
-            print(f"   - MFCC shape: {humming_features['mfcc'].shape}")
-            print(f"   - Chroma shape: {humming_features['chroma'].shape}")
             print(f"   - Pitch shape: {humming_features['pitch'].shape}")
         except Exception as e:
             print(f"❌ Feature extraction error: {e}")
             traceback.print_exc()
             
-            # Clean up
-            try:
-                os.remove(filepath)
-            except:
-                pass
-            
             return jsonify({'error': f'Feature extraction failed: {str(e)}'}), 500
         
-        # Get all songs and compare
-        songs = get_all_songs()
+        # Songs and match-ready features stay in memory between requests;
+        # only rows added / deleted since the last request are (re)loaded
+        snapshot = get_snapshot(current_app.config.get('CATALOG_PATH'))
+        # Version first: refresh() publishes entries before bumping it, so
+        # caches keyed on it never hold entries older than the key
+        catalog_version = snapshot.version
+        catalog = snapshot.entries()
         
-        if len(songs) == 0:
+        if len(snapshot.songs()) == 0:
             print("⚠️ No songs in database")
-            try:
-                os.remove(filepath)
-            except:
-                pass
             return jsonify({'error': 'No songs in database. Please add songs first.'}), 400
         
-        print(f"📚 Comparing with {len(songs)} songs...")
-        matcher = SimilarityMatcher()
+        if len(catalog) == 0:
+            print("❌ Could not compare with any songs")
+            return jsonify({'error': 'Could not compare with any songs'}), 500
+        
+        match_mode = current_app.config.get('MATCH_MODE', 'global')
+        print(f"📚 Comparing with {len(catalog)} songs ({match_mode} matching)...")
+        matcher = SimilarityMatcher(mode=match_mode)
+        
+        parallel_workers = current_app.config.get('PARALLEL_WORKERS', 0)
+        use_parallel = parallel_workers > 0 and match_mode in GLOBAL_MODES
+        
+        ann_index = None if use_parallel else get_ann_index(current_app.config.get('ANN_INDEX_PATH'))
         
-        results = []
+        if ann_index is not None:
+            # Nearest songs by melody embedding, only those go to DTW
+            shortlist = set(ann_index.search(
+                # Same frame-level melody the index was built from, in any mode
+                melody_embedding(SimilarityMatcher().prepare(humming_features)),
+                limit=current_app.config.get('ANN_CANDIDATES', 100)
+            ))
+            # Songs added or re-extracted after the index was built (or that
+            # reuse a deleted song's id) aren't embedded as they are now:
+            # always compared
+            catalog = [
+                (song, features) for song, features in catalog
+                if song.id in shortlist or not ann_index.matches(song.id, source_key(song_source(song)))
+            ]
+            print(f"   ANN index shortlist: {len(catalog)} candidates")
         
-        for song in songs:
+        # Large catalogs: n-gram votes pick a shortlist, only that goes to DTW
+        elif not use_parallel and len(catalog) > current_app.config.get('NGRAM_MIN_CATALOG', 500):
+            index = get_ngram_index(catalog, matcher, catalog_version)
+            shortlist = set(index.query(
+                matcher.prepare(humming_features),
+                limit=current_app.config.get('NGRAM_CANDIDATES', 200)
+            ))
+            catalog = [(song, features) for song, features in catalog if song.id in shortlist]
+            print(f"   N-gram index shortlist: {len(catalog)} candidates")
+        
+        # Songs can have several segments: over-fetch, then one result per song
+        top_k = 5 * current_app.config.get('SEGMENTS_PER_SONG', 1)
+        
+        if use_parallel:
+            # Full catalog scan split across worker processes
+            engine = acquire_parallel_matcher(catalog, parallel_workers, catalog_version, match_mode)
             try:
-                # Load song features
-                song_features = extractor.load_features(song.feature_path)
-                
-                # Calculate similarity
-                total_score, individual_scores = matcher.combined_similarity(
-                    humming_features, 
-                    song_features
-                )
-                
-                results.append({
-                    'song_id': song.id,
-                    'title': song.title,
-                    'artist': song.artist,
-                    'similarity': round(total_score, 2),
-                    'pitch_score': round(individual_scores['pitch'], 2),
-                    'mfcc_score': round(individual_scores['mfcc'], 2),
-                    'chroma_score': round(individual_scores['chroma'], 2)
-                })
-                
-                print(f"   - {song.title}: {total_score:.2f}%")
-                
-            except Exception as e:
-                print(f"⚠️ Error comparing with song {song.title}: {e}")
-                continue
+                matches = engine.search(humming_features, top_k=top_k)
+            finally:
+                release_parallel_matcher(engine)
+            print(f"   Parallel scan: {engine.workers} workers, "
+                  f"full DTW {engine.stats['dtw']}/{engine.stats['candidates']}")
+        elif match_mode == 'subsequence':
+            # Full-length tracks: one pass per song also finds the matched region
+            matches = matcher.match_many(humming_features, catalog, top_k=top_k)
+        elif current_app.config.get('COARSE_TO_FINE_RATIO', 0) > 0:
+            # Rank at 1/16 and 1/4 resolution, full DTW only on the best few
+            search = CoarseToFineSearch(
+                matcher,
+                top_k=top_k,
+                refine_ratio=current_app.config['COARSE_TO_FINE_RATIO']
+            )
+            matches = search.search(humming_features, catalog)
+            print(f"   Coarse-to-fine: {search.stats}")
+        else:
+            # Top 5, best first: LB pruning in front of full DTW
+            search = CascadeSearch(matcher, top_k=top_k)
+            matches = search.search(humming_features, catalog)
+            
+            stats = search.stats
+            print(f"   Pruned: length ratio {stats['length_ratio']} | "
+                  f"LB_Kim {stats['lb_kim']} | LB_Keogh {stats['lb_keogh']} | "
+                  f"full DTW {stats['dtw']}/{stats['candidates']} "
+                  f"({stats['abandoned']} abandoned early)")
+        
+        top_matches = []
+        for song, total_score, individual_scores in best_per_song(matches):
+            match = {
+                'song_id': song.id,
+                'title': song.title,
+                'artist': song.artist,
+                'similarity': round(total_score, 2),
+                'pitch_score': round(individual_scores['pitch'], 2),
+                'mfcc_score': round(individual_scores['mfcc'], 2),
+                'chroma_score': round(individual_scores['chroma'], 2)
+            }
+            offset = song.segment_start or 0.0
+            if song.segment_start is not None:
+                # Which stored section of the song matched (seconds)
+                match['segment_start'] = round(song.segment_start, 2)
+                match['segment_end'] = round(song.segment_end, 2)
+            if 'span' in individual_scores:
+                # Where in the song the hum matched (seconds)
+                match['match_start'] = round(offset + individual_scores['span'][0], 2)
+                match['match_end'] = round(offset + individual_scores['span'][1], 2)
+            top_matches.append(match)
+            
+            print(f"   - {song.title}: {total_score:.2f}%")
         
-        if len(results) == 0:
+        # Every song pruned (length ratio) or outside the candidate shortlist
+        if len(top_matches) == 0:
             print("❌ Could not compare with any songs")
-            try:
-                os.remove(filepath)
-            except:
-                pass
             return jsonify({'error': 'Could not compare with any songs'}), 500
         
-        # Sort by similarity (descending)
-        results.sort(key=lambda x: x['similarity'], reverse=True)
-        
-        # Get top 5
-        top_matches = results[:5]
-        best_match = results[0] if results else None
+        best_match = top_matches[0]
 
         # ADD THIS CHECK:
         if best_match and best_match['similarity'] < 70:
@@ -221,15 +337,8 @@ def upload_humming():
         print(f"\n🎯 BEST MATCH: {best_match['title']} by {best_match['artist']}")
         print(f"   Similarity: {best_match['similarity']}%")
         print(f"   Pitch: {best_match['pitch_score']}%")
-        print(f"   Melody Intervals: {individual_scores['pitch']:.1f}%")
         print("="*60 + "\n")
         
-        # Clean up uploaded file
-        try:
-            os.remove(filepath)
-        except:
-            pass
-        
         return jsonify({
             'success': True,
             'best_match': best_match,
@@ -0,0 +1,107 @@
+import threading
+from utils.feature_extractor import FeatureExtractor
+from utils.similarity import SimilarityMatcher
+from utils.catalog import FeatureCatalog, song_source
+from utils.notes import transcribe_notes
+from models.database import get_all_songs, get_catalog_version
+
+class CatalogSnapshot:
+    """
+    Process-wide, in-memory catalog: song rows plus match-ready features
+    refresh() costs one counter read while nothing changed; after an
+    add / delete / re-extract it reloads only the rows that differ
+    """
+    def __init__(self, catalog_path=None):
+        self.catalog_path = catalog_path
+        self.version = None
+        self.catalog_version = None
+        self._entries = {}
+        self._songs = []
+        self._ordered = []
+        self._lock = threading.Lock()
+        self._extractor = FeatureExtractor(sr=16000)
+        self._matcher = SimilarityMatcher()
+
+    def refresh(self):
+        """Bring the snapshot up to date with the database; True if anything changed"""
+        version = get_catalog_version()
+        catalog_version = FeatureCatalog.version(self.catalog_path) if self.catalog_path else None
+        if version == self.version and catalog_version == self.catalog_version:
+            return False
+
+        with self._lock:
+            # Another request may have refreshed while this one waited
+            if version == self.version and catalog_version == self.catalog_version:
+                return False
+
+            feature_catalog = FeatureCatalog(self.catalog_path) if catalog_version else None
+            previous = set(self._entries)
+            if catalog_version != self.catalog_version:
+                # Old slices point into the previous mapping
+                self._entries = {}
+
+            entries = {}
+            loaded = 0
+            for song in get_all_songs():
+                old = self._entries.get(song.id)
+                if old is not None and self._row_key(old[0]) == self._row_key(song):
+                    entries[song.id] = (song, old[1])
+                    continue
+
+                # Failed loads are kept as None, retried only when the row changes
+                entries[song.id] = (song, self._load(song, feature_catalog))
+                loaded += 1
+
+            removed = len(previous - set(entries))
+            self._entries = entries
+            self._songs = [entries[song_id][0] for song_id in sorted(entries)]
+            self._ordered = [
+                entries[song_id] for song_id in sorted(entries)
+                if entries[song_id][1] is not None
+            ]
+            self.version = version
+            self.catalog_version = catalog_version
+
+        print(f"📚 Catalog snapshot v{version}: {len(entries)} songs "
+              f"({loaded} loaded, {removed} removed)")
+        return True
+
+    def entries(self):
+        """(song, features) pairs in song-id order, songs whose features loaded"""
+        return self._ordered
+
+    def songs(self):
+        """All song rows in song-id order"""
+        return self._songs
+
+    def _load(self, song, feature_catalog):
+        """Match-ready features of one song: mapped slices, else its .npy file (None on error)"""
+        try:
+            # Only while the packed row still comes from this song's features
+            if feature_catalog is not None and feature_catalog.matches(song.id, song_source(song)):
+                return feature_catalog.features(song.id)
+
+            features = self._extractor.load_features(song.feature_path)
+            if 'notes' not in features and 'pitch' in features:
+                # Older ingests have no note events: transcribe once here,
+                # not in every 'notes' mode request
+                features['notes'] = transcribe_notes(features['pitch'])
+            features.update(self._matcher.prepare(features))
+            return features
+        except Exception as e:
+            print(f"⚠️ Error loading features for song {song.title}: {e}")
+            return None
+
+    def _row_key(self, song):
+        """Columns whose change means the stored features changed"""
+        return song.feature_path, song.feature_fingerprint, song.content_hash
+
+_snapshot = None
+
+def get_snapshot(catalog_path=None):
+    """The process-wide snapshot, refreshed against the database"""
+    global _snapshot
+    if _snapshot is None or _snapshot.catalog_path != catalog_path:
+        _snapshot = CatalogSnapshot(catalog_path)
+    _snapshot.refresh()
+    return _snapshot
@@ -0,0 +1,78 @@
+import csv
+import sys
+import time
+import librosa
+from utils.feature_extractor import FeatureExtractor
+from utils.pitch_tracker import PITCH_TRACKERS
+from utils.similarity import SimilarityMatcher
+from models.database import get_all_songs
+
+def load_manifest(manifest_path):
+    """CSV with columns: path,title (title = expected catalog match)"""
+    with open(manifest_path, newline='', encoding='utf-8') as f:
+        return [(row['path'], row['title']) for row in csv.DictReader(f)]
+
+def benchmark_pitch_trackers(manifest_path, trackers=None):
+    """
+    For every pitch tracker backend: real-time factor of feature extraction
+    and top-1 / top-5 match accuracy of the test clips against the catalog
+    """
+    queries = load_manifest(manifest_path)
+    trackers = trackers or list(PITCH_TRACKERS)
+    
+    songs = get_all_songs()
+    if not songs:
+        print("❌ No songs in database!")
+        return None
+    
+    loader = FeatureExtractor(sr=16000)
+    catalog = [(song, loader.load_features(song.feature_path)) for song in songs]
+    matcher = SimilarityMatcher()
+    
+    print("="*60)
+    print(f"⏱️ Benchmarking {len(trackers)} pitch trackers on {len(queries)} clips, "
+          f"{len(catalog)} songs")
+    print("="*60)
+    
+    report = {}
+    
+    for tracker in trackers:
+        extractor = FeatureExtractor(sr=16000, pitch_tracker=tracker)
+        audio_seconds = 0.0
+        compute_seconds = 0.0
+        top1 = 0
+        top5 = 0
+        
+        for path, title in queries:
+            audio_seconds += librosa.get_duration(path=path)
+            
+            start = time.perf_counter()
+            features = extractor.extract_features(path, profile='melody')
+            compute_seconds += time.perf_counter() - start
+            
+            ranked = [song.title for song, _, _ in matcher.match_many(features, catalog, top_k=5)]
+            top1 += int(bool(ranked) and ranked[0] == title)
+            top5 += int(title in ranked)
+        
+        report[tracker] = {
+            'rtf': compute_seconds / max(audio_seconds, 1e-9),
+            'top1': top1 / max(len(queries), 1),
+            'top5': top5 / max(len(queries), 1)
+        }
+        
+        print(f"{tracker:>10}: RTF {report[tracker]['rtf']:.4f} | "
+              f"top-1 {100 * report[tracker]['top1']:.1f}% | "
+              f"top-5 {100 * report[tracker]['top5']:.1f}%")
+    
+    print("="*60)
+    print("RTF = extraction time / audio duration (lower is faster)")
+    return report
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python benchmark_pitch_trackers.py <manifest.csv> [tracker ...]")
+        print("Manifest columns: path,title")
+        print(f"Trackers: {', '.join(PITCH_TRACKERS)}")
+        sys.exit(1)
+    
+    benchmark_pitch_trackers(sys.argv[1], sys.argv[2:] or None)
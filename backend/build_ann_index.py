@@ -0,0 +1,57 @@
+import os
+import sys
+from utils.feature_extractor import FeatureExtractor
+from utils.similarity import SimilarityMatcher
+from utils.embedding import melody_embedding
+from utils.ann_index import IVFIndex
+from utils.catalog import song_source, source_key
+from models.database import get_all_songs
+
+INDEX_PATH = os.path.join('database', 'ann_index.npz')
+
+def build_ann_index(index_path=INDEX_PATH, n_probe=16):
+    """
+    Embed every song's melody and save an IVF index for /api/upload-humming
+    Re-run after bulk changes; songs added or re-extracted later are still
+    matched (unindexed songs are always compared), just without the
+    sublinear shortlist
+    """
+    extractor = FeatureExtractor(sr=16000)
+    matcher = SimilarityMatcher()
+    songs = get_all_songs()
+    
+    if not songs:
+        print("❌ No songs in database!")
+        return None
+    
+    print("="*60)
+    print(f"🧭 Building ANN index for {len(songs)} songs")
+    print("="*60)
+    
+    keys = []
+    sources = []
+    vectors = []
+    
+    for song in songs:
+        try:
+            features = extractor.load_features(song.feature_path)
+            vectors.append(melody_embedding(matcher.prepare(features)))
+            keys.append(song.id)
+            sources.append(source_key(song_source(song)))
+        except Exception as e:
+            print(f"⚠️ Skipping {song.title}: {e}")
+    
+    if not keys:
+        print("❌ Could not embed any songs")
+        return None
+    
+    index = IVFIndex(n_probe=n_probe).build(keys, vectors, sources=sources)
+    index.save(index_path)
+    
+    print(f"✅ Indexed {len(index)} songs in {index.n_lists} lists -> {index_path}")
+    print("="*60)
+    return index
+
+if __name__ == "__main__":
+    probes = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    build_ann_index(n_probe=probes)
@@ -0,0 +1,56 @@
+import os
+import sys
+from utils.feature_extractor import FeatureExtractor
+from utils.similarity import SimilarityMatcher
+from utils.notes import transcribe_notes
+from utils.catalog import write_catalog, FeatureCatalog, song_source
+from models.database import get_all_songs
+
+CATALOG_PATH = os.path.join('database', 'catalog')
+
+def build_catalog(catalog_path=CATALOG_PATH):
+    """
+    Pack every song's match-ready features into the memory-mapped
+    columnar catalog used by /api/upload-humming
+    Re-run after bulk changes; songs added or re-extracted later are
+    still matched (loaded from their .npy file), just without the shared
+    mapping
+    """
+    extractor = FeatureExtractor(sr=16000)
+    matcher = SimilarityMatcher()
+    songs = get_all_songs()
+    
+    if not songs:
+        print("❌ No songs in database!")
+        return None
+    
+    print("="*60)
+    print(f"🗂️ Building catalog for {len(songs)} songs")
+    print("="*60)
+    
+    entries = []
+    
+    for song in songs:
+        try:
+            features = extractor.load_features(song.feature_path)
+            features.update(matcher.prepare(features))
+            if 'notes' not in features:
+                features['notes'] = transcribe_notes(features['pitch'])
+            entries.append((song.id, song_source(song), features))
+        except Exception as e:
+            print(f"⚠️ Skipping {song.title}: {e}")
+    
+    if not entries:
+        print("❌ Could not load any songs")
+        return None
+    
+    write_catalog(entries, catalog_path)
+    catalog = FeatureCatalog(catalog_path)
+    
+    size = sum(column.nbytes for column in catalog.columns.values())
+    print(f"✅ Packed {len(catalog)} songs ({size / 1e6:.1f} MB) -> {catalog_path}")
+    print("="*60)
+    return catalog
+
+if __name__ == "__main__":
+    build_catalog(sys.argv[1] if len(sys.argv) > 1 else CATALOG_PATH)
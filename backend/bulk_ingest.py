@@ -0,0 +1,183 @@
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from add_song import extract_song_features, content_hash
+from utils.feature_extractor import FeatureExtractor
+from utils.similarity import SimilarityMatcher
+from models.database import add_songs, get_content_hashes
+
+AUDIO_EXTENSIONS = {'.wav', '.mp3', '.flac', '.ogg', '.m4a', '.aac'}
+CHECKPOINT_PATH = os.path.join('database', 'ingest_checkpoint.jsonl')
+BATCH_SIZE = 100
+
+# Per-worker state, filled by _init_worker
+_worker = {}
+
+def _init_worker(known_hashes):
+    """Process pool initializer: imports, extractor and matcher set up once per worker"""
+    from threadpoolctl import threadpool_limits
+    
+    # One core per worker: no BLAS oversubscription
+    _worker['limits'] = threadpool_limits(limits=1)
+    _worker['extractor'] = FeatureExtractor(sr=16000)
+    _worker['matcher'] = SimilarityMatcher()
+    _worker['known'] = known_hashes
+
+def _ingest_file(job):
+    """
+    Hash, extract and save one file inside a worker
+    Returns (path, content_hash, Song row), row None if already ingested
+    """
+    path, title, artist = job
+    digest = content_hash(path)
+    if digest in _worker['known']:
+        return path, digest, None
+    
+    features, duration = extract_song_features(
+        path, _worker['extractor'], _worker['matcher'], source_hash=digest
+    )
+    
+    # Named by content, so a re-run after a crash overwrites instead of duplicating
+    feature_path = os.path.join('song_features', f"song_{digest[:16]}.npy")
+    _worker['extractor'].save_features(features, feature_path)
+    
+    return path, digest, {
+        'title': title,
+        'artist': artist,
+        'duration': duration,
+        'feature_path': feature_path,
+        'content_hash': digest,
+        'source_path': os.path.abspath(path),
+        'feature_fingerprint': features['meta']['fingerprint']
+    }
+
+def title_from_filename(path):
+    """'Artist - Title.ext' -> (title, artist); otherwise the file name is the title"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if ' - ' in stem:
+        artist, title = stem.split(' - ', 1)
+        return title.strip(), artist.strip()
+    return stem, 'Unknown'
+
+def load_jobs(source):
+    """
+    (path, title, artist) for every file to ingest
+    source: a directory (searched recursively for audio files) or a CSV
+    manifest with columns path,title,artist (paths relative to the CSV)
+    """
+    if os.path.isdir(source):
+        jobs = []
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                    path = os.path.join(root, name)
+                    jobs.append((path, *title_from_filename(path)))
+        return sorted(jobs)
+    
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, newline='', encoding='utf-8') as f:
+        return [
+            (
+                os.path.join(base, row['path']),
+                row.get('title') or title_from_filename(row['path'])[0],
+                row.get('artist') or 'Unknown'
+            )
+            for row in csv.DictReader(f)
+        ]
+
+def load_checkpoint(checkpoint_path):
+    """Absolute paths already committed (or skipped) by earlier runs"""
+    if not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path, encoding='utf-8') as f:
+        return {json.loads(line)['path'] for line in f if line.strip()}
+
+def _record(checkpoint, path, digest, status):
+    """Append one finished file to the checkpoint"""
+    checkpoint.write(json.dumps({'path': os.path.abspath(path), 'hash': digest, 'status': status}) + '\n')
+
+def _commit(batch, checkpoint):
+    """Insert a batch of rows in one transaction, then checkpoint them"""
+    song_ids = add_songs([row for _, _, row in batch])
+    for path, digest, _ in batch:
+        _record(checkpoint, path, digest, 'added')
+    checkpoint.flush()
+    print(f"   💾 Committed {len(song_ids)} songs (last ID {song_ids[-1]})")
+    return len(song_ids)
+
+def bulk_ingest(source, workers=None, batch_size=BATCH_SIZE, checkpoint_path=CHECKPOINT_PATH):
+    """
+    Ingest a directory or CSV manifest of songs across a process pool
+    Files whose content hash is already in the database are skipped, and
+    progress is checkpointed per committed batch, so re-running the same
+    command after a crash resumes where it stopped
+    """
+    jobs = load_jobs(source)
+    done = load_checkpoint(checkpoint_path)
+    pending = [job for job in jobs if os.path.abspath(job[0]) not in done]
+    known = get_content_hashes()
+    workers = workers or os.cpu_count() or 1
+    
+    print("="*60)
+    print(f"📥 Ingesting {len(pending)} of {len(jobs)} files with {workers} workers "
+          f"({len(jobs) - len(pending)} done in earlier runs)")
+    print("="*60)
+    
+    added = skipped = failed = 0
+    batch = []
+    
+    with open(checkpoint_path, 'a', encoding='utf-8') as checkpoint, ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(known,)
+    ) as pool:
+        futures = {pool.submit(_ingest_file, job): job for job in pending}
+        
+        try:
+            for future in as_completed(futures):
+                path = futures[future][0]
+                try:
+                    path, digest, row = future.result()
+                except Exception as e:
+                    # Not checkpointed: retried on the next run
+                    failed += 1
+                    print(f"❌ Error processing {path}: {e}")
+                    continue
+                
+                # Already in the database, or a duplicate earlier in this run
+                if row is None or digest in known:
+                    skipped += 1
+                    _record(checkpoint, path, digest, 'skipped')
+                    continue
+                
+                known.add(digest)
+                batch.append((path, digest, row))
+                if len(batch) >= batch_size:
+                    added += _commit(batch, checkpoint)
+                    batch = []
+        finally:
+            # Keep finished work even if the run is interrupted
+            if batch:
+                added += _commit(batch, checkpoint)
+            for future in futures:
+                future.cancel()
+    
+    print("="*60)
+    print(f"✅ Added {added} | ⏭️ Skipped {skipped} | ❌ Failed {failed}")
+    print("="*60)
+    return added, skipped, failed
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python bulk_ingest.py <directory|manifest.csv> [workers]")
+        print("Manifest columns: path,title,artist")
+        print("Directory files named 'Artist - Title.ext' get artist and title from the name")
+        sys.exit(1)
+    
+    if not os.path.exists(sys.argv[1]):
+        print(f"❌ Not found: {sys.argv[1]}")
+        sys.exit(1)
+    
+    bulk_ingest(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else None)
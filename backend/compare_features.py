@@ -10,7 +10,7 @@ def compare_same_song():
     extractor = FeatureExtractor(sr=16000)
     
     # Load the stored features
-    stored_features = extractor.load_features('song_features/song_living_life_in_the_night.npy')
+    stored_features = extractor.load_features('song_features/song_living_life_in_the_night.npy', spectral=True)
     
     print("="*60)
     print("Stored features for 'Living Life in the Night':")
@@ -1,6 +1,7 @@
 import sys
 import os
 from models.database import get_session, Song
+from utils.feature_extractor import spectral_path
 
 def delete_song(song_id):
     """Delete a song from database and remove its feature file"""
@@ -21,6 +22,10 @@ def delete_song(song_id):
             os.remove(song.feature_path)
             print(f"✅ Deleted feature file: {song.feature_path}")
         
+        # Spectral sidecar of compact feature files
+        if song.feature_path and os.path.exists(spectral_path(song.feature_path)):
+            os.remove(spectral_path(song.feature_path))
+        
         # Delete from database
         session.delete(song)
         session.commit()
@@ -1,46 +1,140 @@
 import os
 import sys
 import librosa
-import soundfile as sf
 import numpy as np
+from utils.audio_processor import load_audio
 from utils.feature_extractor import FeatureExtractor
-from models.database import add_song
+from utils.similarity import SimilarityMatcher
+from add_song import content_hash
+from utils.fingerprint import stamp_features
+from models.database import add_songs
 
-def find_chorus_section(y, sr, duration=30):
+# Self-similarity is computed on ~0.5 s blocks, at most MAX_BLOCKS of them
+BLOCK_SECONDS = 0.5
+MAX_BLOCKS = 1200
+
+def window_means(values, window):
+    """Mean of every length-window run of values, via one cumulative sum"""
+    sums = np.concatenate([[0.0], np.cumsum(values)])
+    return (sums[window:] - sums[:-window]) / window
+
+def local_maxima(values):
+    """Mask of values at least as large as both neighbours (plateaus included)"""
+    padded = np.concatenate([[-np.inf], values, [-np.inf]])
+    return (values >= padded[:-2]) & (values >= padded[2:])
+
+def find_chorus_sections(y, sr, duration=30, n_sections=3, repetition_weight=0.6,
+                         repeat_threshold=0.9):
     """
-    Find the most energetic section (likely chorus)
-    Returns start and end in seconds
+    Find the top-N distinct repeated sections (chorus first, then verses...)
+    Each window is scored by how strongly its chroma repeats elsewhere in
+    the song (diagonal runs of the self-similarity matrix) and by its mean
+    energy; a pick blocks windows overlapping it, or another occurrence of
+    it (a local maximum of its diagonal similarity reaching repeat_threshold
+    of its own repetition, both above the song's median similarity), by
+    more than half a window
+    Returns [(start, end), ...] in seconds, best first
     """
-    # Calculate energy over time
     hop_length = 512
     frame_length = 2048
     
-    # RMS energy
     rms = librosa.feature.rms(y=y, frame_length=frame_length, hop_length=hop_length)[0]
+    chroma = librosa.feature.chroma_stft(y=y, sr=sr, n_fft=frame_length, hop_length=hop_length)
+    
+    # Pool frames into blocks so the self-similarity matrix stays small
+    block = max(int(round(BLOCK_SECONDS * sr / hop_length)), int(np.ceil(len(rms) / MAX_BLOCKS)))
+    n_blocks = len(rms) // block
+    window = int(round(duration * sr / (hop_length * block)))
+    
+    if n_blocks <= window or window < 1:
+        return [(0.0, len(y) / sr)]
+    
+    energy = rms[:n_blocks * block].reshape(n_blocks, block).mean(axis=1)
+    chroma = chroma[:, :n_blocks * block].reshape(len(chroma), n_blocks, block).mean(axis=2)
+    
+    # Energy criterion: mean RMS of every window in one pass
+    energy_score = window_means(energy, window)
+    energy_score = energy_score / (energy_score.max() or 1.0)
+    
+    # Cosine self-similarity of the chroma blocks
+    unit = chroma / np.maximum(np.linalg.norm(chroma, axis=0), 1e-9)
+    ssm = unit.T @ unit
+    
+    # lagged[i, lag] = ssm[i, i + lag]; running sums down each diagonal
+    rows = np.arange(n_blocks)
+    lags = np.arange(n_blocks)
+    columns = rows[:, None] + lags[None, :]
+    lagged = np.where(columns < n_blocks, ssm[rows[:, None], np.minimum(columns, n_blocks - 1)], 0.0)
+    sums = np.vstack([np.zeros(n_blocks), np.cumsum(lagged, axis=0)])
     
-    # Convert to time
-    times = librosa.frames_to_time(np.arange(len(rms)), sr=sr, hop_length=hop_length)
+    # diagonal[s, lag]: window at s against the window lag blocks later
+    starts = np.arange(n_blocks - window + 1)
+    diagonal = (sums[starts + window] - sums[starts]) / window
+    valid = (starts[:, None] + lags[None, :] + window <= n_blocks) & (lags[None, :] >= window)
+    diagonal = np.where(valid, diagonal, -np.inf)
     
-    # Find section with highest average energy
-    window_frames = int(duration * sr / hop_length)
+    # Best repeat of each window, either later (s + lag) or earlier (s - lag)
+    earlier_rows = starts[:, None] - lags[None, :]
+    earlier = np.where(
+        earlier_rows >= 0,
+        diagonal[np.maximum(earlier_rows, 0), lags[None, :]],
+        -np.inf
+    )
+    repetition = np.maximum(diagonal.max(axis=1), earlier.max(axis=1))
+    repeats = np.isfinite(repetition)
     
-    best_energy = 0
-    best_start_frame = 0
+    # Typical similarity of two unrelated windows; repeats are judged by how
+    # far they rise above it (a drone or steady pad lifts every cosine)
+    baseline = np.median(diagonal[np.isfinite(diagonal)]) if repeats.any() else 0.0
     
-    for i in range(len(rms) - window_frames):
-        energy = np.mean(rms[i:i+window_frames])
-        if energy > best_energy:
-            best_energy = energy
-            best_start_frame = i
+    if repeats.any():
+        repetition = np.where(repeats, repetition, 0.0)
+        score = repetition_weight * repetition + (1 - repetition_weight) * energy_score
+    else:
+        # Song too short for two non-overlapping windows: energy only
+        score = energy_score
     
-    start_time = times[best_start_frame]
-    end_time = start_time + duration
+    # Greedy picks over the score's local maxima first (a window shifted
+    # off a section boundary is never better than the aligned one), then
+    # any other window, so fewer than n_sections come back only when
+    # everything left is another occurrence of a pick
+    sections = []
+    available = np.ones(len(starts), dtype=bool)
+    half = window // 2
+    seconds_per_block = block * hop_length / sr
+    order = np.argsort(-score, kind='stable')
+    peaks = local_maxima(score)
     
-    return start_time, end_time
+    for start in np.concatenate([order[peaks[order]], order[~peaks[order]]]):
+        if not available[start]:
+            continue
+        sections.append((float(start * seconds_per_block), float((start + window) * seconds_per_block)))
+        if len(sections) == n_sections:
+            break
+        
+        # Occurrences: the pick itself and, if it repeats, every local
+        # maximum of its diagonal similarity that doesn't overlap it
+        occurrences = [start]
+        if repeats[start]:
+            lag = np.abs(starts - start)
+            first = np.minimum(starts, start)
+            similarity = (sums[first + window, lag] - sums[first, lag]) / window
+            hits = (
+                local_maxima(similarity) & (lag >= window) &
+                (similarity - baseline >= repeat_threshold * (repetition[start] - baseline))
+            )
+            occurrences.extend(np.flatnonzero(hits))
+        
+        # Block windows overlapping an occurrence by more than half a window
+        for occurrence in occurrences:
+            available[max(occurrence - half, 0):occurrence + half + 1] = False
+    
+    return sections
 
-def extract_and_add_chorus(audio_path, title, artist, chorus_duration=30):
+def extract_and_add_chorus(audio_path, title, artist, chorus_duration=30, n_sections=3):
     """
-    Extract chorus section and add to database
+    Extract the top repeated sections and add each one to the database
+    as a separate matchable segment of the same song
     """
     try:
         print("="*60)
@@ -49,56 +143,61 @@ def extract_and_add_chorus(audio_path, title, artist, chorus_duration=30):
         
         # Load full audio
         print("📂 Loading audio...")
-        y_full, sr = librosa.load(audio_path, sr=16000)
+        y_full, sr = load_audio(audio_path, sr=16000)
         total_duration = len(y_full) / sr
         print(f"   Total duration: {total_duration:.1f}s")
         
-        # Find chorus
-        print("🔍 Finding chorus section...")
-        start, end = find_chorus_section(y_full, sr, chorus_duration)
-        print(f"   Chorus found: {start:.1f}s to {end:.1f}s")
-        
-        # Extract chorus
-        start_sample = int(start * sr)
-        end_sample = int(end * sr)
-        y_chorus = y_full[start_sample:end_sample]
+        # Find chorus and other repeated sections
+        print("🔍 Finding repeated sections...")
+        sections = find_chorus_sections(y_full, sr, chorus_duration, n_sections)
         
-        # Save temporary file
-        temp_file = "temp_chorus.wav"
-        sf.write(temp_file, y_chorus, sr)
-        
-        # Extract features (MELODY-FOCUSED)
-        print("🎵 Extracting melody features...")
         extractor = FeatureExtractor(sr=16000)
-        features = extractor.extract_features(temp_file)
-        
-        # Verify pitch extraction
-        voiced_frames = np.sum(features['pitch'] > 0)
-        total_frames = len(features['pitch'])
-        print(f"   Voiced frames: {voiced_frames}/{total_frames} ({100*voiced_frames/total_frames:.1f}%)")
-        
-        if voiced_frames < total_frames * 0.3:
-            print("   ⚠️ WARNING: Low voiced content, might be instrumental!")
-        
-        # Save features
-        feature_filename = f"song_{title.replace(' ', '_').lower()}_chorus.npy"
-        feature_path = os.path.join('song_features', feature_filename)
-        extractor.save_features(features, feature_path)
+        matcher = SimilarityMatcher()
+        source_hash = content_hash(audio_path)
+        rows = []
         
-        # Add to database
-        song_id = add_song(
-            title=title,
-            artist=artist,
-            duration=chorus_duration,
-            feature_path=feature_path
-        )
+        for number, (start, end) in enumerate(sections, 1):
+            print(f"   Section {number}: {start:.1f}s to {end:.1f}s")
+            
+            # Extract features (MELODY-FOCUSED) straight from the slice
+            y_section = y_full[int(start * sr):int(end * sr)]
+            features = extractor.extract_features(y_section, sr=sr)
+            
+            # Store match-ready melody (intervals, contour, PAA pyramid) next to raw pitch
+            features.update(matcher.prepare(features))
+            fingerprint = stamp_features(features, extractor, source_hash)
+            
+            # Verify pitch extraction
+            voiced_frames = np.sum(features['pitch'] > 0)
+            total_frames = len(features['pitch'])
+            print(f"   Voiced frames: {voiced_frames}/{total_frames} ({100*voiced_frames/total_frames:.1f}%)")
+            
+            if voiced_frames < total_frames * 0.3:
+                print("   ⚠️ WARNING: Low voiced content, might be instrumental!")
+            
+            # Save features
+            feature_filename = f"song_{title.replace(' ', '_').lower()}_chorus_{number}.npy"
+            feature_path = os.path.join('song_features', feature_filename)
+            extractor.save_features(features, feature_path)
+            
+            rows.append({
+                'title': title,
+                'artist': artist,
+                'duration': end - start,
+                'feature_path': feature_path,
+                'content_hash': source_hash,
+                'source_path': os.path.abspath(audio_path),
+                'segment_start': start,
+                'segment_end': end,
+                'feature_fingerprint': fingerprint
+            })
         
-        # Clean up
-        os.remove(temp_file)
+        # Add all segments in one transaction
+        song_ids = add_songs(rows)
         
-        print(f"✅ Added song ID {song_id}: {title}")
+        print(f"✅ Added song IDs {song_ids}: {title}")
         print("="*60)
-        return song_id
+        return song_ids
         
     except Exception as e:
         print(f"❌ Error: {str(e)}")
@@ -108,7 +207,7 @@ def extract_and_add_chorus(audio_path, title, artist, chorus_duration=30):
 
 if __name__ == "__main__":
     if len(sys.argv) < 3:
-        print("Usage: python extract_chorus.py <audio_file> <title> <artist>")
+        print("Usage: python extract_chorus.py <audio_file> <title> <artist> [sections]")
         sys.exit(1)
     
     audio_file = sys.argv[1]
@@ -119,4 +218,5 @@ if __name__ == "__main__":
         print(f"❌ File not found: {audio_file}")
         sys.exit(1)
     
-    extract_and_add_chorus(audio_file, song_title, song_artist)
\ No newline at end of file
+    sections = int(sys.argv[4]) if len(sys.argv) > 4 else 3
+    extract_and_add_chorus(audio_file, song_title, song_artist, n_sections=sections)
\ No newline at end of file
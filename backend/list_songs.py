@@ -20,6 +20,8 @@ def list_all_songs():
         print(f"Title: {song.title}")
         print(f"Artist: {song.artist}")
         print(f"Duration: {song.duration:.2f} seconds")
+        if song.segment_start is not None:
+            print(f"Segment: {song.segment_start:.1f}s to {song.segment_end:.1f}s")
         print(f"Features: {song.feature_path}")
         print("-" * 60)
 
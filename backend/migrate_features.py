@@ -0,0 +1,57 @@
+import os
+import sys
+import numpy as np
+from utils.feature_extractor import FeatureExtractor, spectral_path
+
+FEATURES_DIR = 'song_features'
+
+def migrate_features(features_dir=FEATURES_DIR, drop_spectral=False):
+    """
+    Convert every full-precision feature file in features_dir to compact
+    storage, in place (same file names, so database rows stay valid)
+    drop_spectral: don't keep the MFCC / chroma / centroid sidecar
+    """
+    extractor = FeatureExtractor(sr=16000)
+    paths = sorted(
+        os.path.join(features_dir, name) for name in os.listdir(features_dir)
+        if name.endswith('.npy') and not name.endswith('_spectral.npy')
+    )
+    
+    print("="*60)
+    print(f"🗜️ Migrating {len(paths)} feature files in {features_dir}")
+    print("="*60)
+    
+    before = after = converted = 0
+    
+    for path in paths:
+        try:
+            size = os.path.getsize(path)
+            if 'compact' in np.load(path, allow_pickle=True).item():
+                continue
+            
+            features = extractor.load_features(path)
+            if drop_spectral:
+                for key in ('mfcc', 'chroma', 'spectral_centroid'):
+                    features.pop(key, None)
+            
+            # Write next to the original, then swap it in
+            staging = path + '.tmp.npy'
+            extractor.save_features(features, staging)
+            os.replace(staging, path)
+            if os.path.exists(spectral_path(staging)):
+                os.replace(spectral_path(staging), spectral_path(path))
+            
+            before += size
+            after += os.path.getsize(path)
+            converted += 1
+        except Exception as e:
+            print(f"⚠️ Skipping {path}: {e}")
+    
+    print(f"✅ Converted {converted} files: {before / 1e6:.2f} MB -> {after / 1e6:.2f} MB "
+          f"(spectral sidecars not counted)")
+    print("="*60)
+    return converted
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != '--drop-spectral']
+    migrate_features(args[0] if args else FEATURES_DIR, '--drop-spectral' in sys.argv)
@@ -1,6 +1,6 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float
+from sqlalchemy import create_engine, event, inspect, text, Column, Integer, String, Float
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
 import os
 
 Base = declarative_base()
@@ -9,10 +9,15 @@ class Song(Base):
     __tablename__ = 'songs'
     
     id = Column(Integer, primary_key=True)
-    title = Column(String(200), nullable=False)
-    artist = Column(String(200), nullable=False)
+    title = Column(String(200), nullable=False, index=True)
+    artist = Column(String(200), nullable=False, index=True)
     duration = Column(Float)  # in seconds
     feature_path = Column(String(500))  # path to .npy file
+    content_hash = Column(String(40), index=True)  # sha1 of the source audio file
+    source_path = Column(String(1000))  # audio file the features came from
+    segment_start = Column(Float)  # section of the source (seconds), None = whole file
+    segment_end = Column(Float)
+    feature_fingerprint = Column(String(16))  # extractor config the features came from
     
     def __repr__(self):
         return f"<Song(id={self.id}, title='{self.title}', artist='{self.artist}')>"
@@ -23,21 +28,92 @@ os.makedirs(DB_DIR, exist_ok=True)
 
 # Database connection
 DATABASE_PATH = os.path.join(DB_DIR, 'songs.db')
-engine = create_engine(f'sqlite:///{DATABASE_PATH}', echo=False)
+engine = create_engine(
+    f'sqlite:///{DATABASE_PATH}',
+    echo=False,
+    # Pooled connections are handed between Flask worker threads
+    connect_args={'check_same_thread': False}
+)
+
+# Applied to every new connection
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',  # readers don't block on (and aren't blocked by) a writer
+    'synchronous': 'NORMAL',  # durable with WAL, no fsync per commit
+    'busy_timeout': 30000,  # ms a second writer waits instead of failing
+    'cache_size': -65536,  # 64 MB page cache
+    'temp_store': 'MEMORY',
+    'mmap_size': 268435456,  # 256 MB memory-mapped reads
+}
+
+@event.listens_for(engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
 Base.metadata.create_all(engine)
-Session = sessionmaker(bind=engine)
+
+# One session per thread; Flask removes it after each request (app teardown)
+Session = scoped_session(sessionmaker(bind=engine, expire_on_commit=False))
+
+def migrate_columns(engine):
+    """Add model columns missing from an existing songs table (SQLite ALTER TABLE)"""
+    existing = {column['name'] for column in inspect(engine).get_columns(Song.__tablename__)}
+    with engine.begin() as connection:
+        for column in Song.__table__.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(
+                    f'ALTER TABLE {Song.__tablename__} ADD COLUMN {column.name} {column_type}'
+                ))
+
+migrate_columns(engine)
+
+def create_indexes(engine):
+    """Model indexes missing from an existing songs table (create_all skips existing tables)"""
+    for index in Song.__table__.indexes:
+        index.create(engine, checkfirst=True)
+
+create_indexes(engine)
+
+def install_change_counter(engine):
+    """
+    catalog_version: one counter row that SQLite triggers bump on every
+    insert / update / delete of songs, from any process or connection
+    """
+    statements = [
+        'CREATE TABLE IF NOT EXISTS catalog_version (id INTEGER PRIMARY KEY, version INTEGER NOT NULL)',
+        'INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0)',
+    ] + [
+        f'CREATE TRIGGER IF NOT EXISTS songs_version_{event.lower()} AFTER {event} ON songs '
+        f'BEGIN UPDATE catalog_version SET version = version + 1 WHERE id = 1; END'
+        for event in ('INSERT', 'UPDATE', 'DELETE')
+    ]
+    with engine.begin() as connection:
+        for statement in statements:
+            connection.execute(text(statement))
+
+install_change_counter(engine)
 
 def get_session():
+    """This thread's session; close() returns its connection to the pool"""
     return Session()
 
-def add_song(title, artist, duration, feature_path):
+def add_song(title, artist, duration, feature_path, content_hash=None, source_path=None,
+             segment_start=None, segment_end=None, feature_fingerprint=None):
     """Add a new song to the database"""
     session = get_session()
     song = Song(
         title=title,
         artist=artist,
         duration=duration,
-        feature_path=feature_path
+        feature_path=feature_path,
+        content_hash=content_hash,
+        source_path=source_path,
+        segment_start=segment_start,
+        segment_end=segment_end,
+        feature_fingerprint=feature_fingerprint
     )
     session.add(song)
     session.commit()
@@ -45,6 +121,39 @@ def add_song(title, artist, duration, feature_path):
     session.close()
     return song_id
 
+def add_songs(rows):
+    """
+    Add many songs in one transaction
+    rows: dicts of Song columns (title, artist, duration, feature_path, ...)
+    Returns the new song IDs in row order
+    """
+    session = get_session()
+    songs = [Song(**row) for row in rows]
+    session.add_all(songs)
+    session.commit()
+    song_ids = [song.id for song in songs]
+    session.close()
+    return song_ids
+
+def update_songs(rows):
+    """Update many songs in one transaction; rows: dicts with 'id' plus changed columns"""
+    session = get_session()
+    session.bulk_update_mappings(Song, rows)
+    session.commit()
+    session.close()
+
+def get_content_hashes():
+    """Content hashes of every ingested source file"""
+    session = get_session()
+    hashes = {h for (h,) in session.query(Song.content_hash).filter(Song.content_hash.isnot(None))}
+    session.close()
+    return hashes
+
+def get_catalog_version():
+    """Songs table change counter (one indexed read, no ORM session)"""
+    with engine.connect() as connection:
+        return connection.execute(text('SELECT version FROM catalog_version WHERE id = 1')).scalar()
+
 def get_all_songs():
     """Retrieve all songs from database"""
     session = get_session()
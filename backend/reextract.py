@@ -0,0 +1,106 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from add_song import extract_song_features
+from utils.feature_extractor import FeatureExtractor, spectral_path
+from utils.similarity import SimilarityMatcher
+from utils.fingerprint import feature_fingerprint
+from models.database import get_all_songs, update_songs
+
+BATCH_SIZE = 100
+
+# Per-worker state, filled by _init_worker
+_worker = {}
+
+def _init_worker():
+    """Process pool initializer: one extractor / matcher per worker"""
+    from threadpoolctl import threadpool_limits
+    
+    # One core per worker: no BLAS oversubscription
+    _worker['limits'] = threadpool_limits(limits=1)
+    _worker['extractor'] = FeatureExtractor(sr=16000)
+    _worker['matcher'] = SimilarityMatcher()
+
+def _reextract(job):
+    """Recompute one song's features into its existing feature file"""
+    song_id, source_path, feature_path, segment = job
+    extractor = _worker['extractor']
+    
+    features, duration = extract_song_features(source_path, extractor, _worker['matcher'], segment)
+    
+    # Write next to the old file, then swap it in
+    staging = feature_path + '.tmp.npy'
+    extractor.save_features(features, staging)
+    os.replace(staging, feature_path)
+    if os.path.exists(spectral_path(staging)):
+        os.replace(spectral_path(staging), spectral_path(feature_path))
+    
+    return {
+        'id': song_id,
+        'duration': duration,
+        'content_hash': features['meta']['content_hash'],
+        'feature_fingerprint': features['meta']['fingerprint']
+    }
+
+def stale_songs(fingerprint):
+    """Songs whose stored features weren't made with the current fingerprint"""
+    return [song for song in get_all_songs() if song.feature_fingerprint != fingerprint]
+
+def reextract(workers=None, batch_size=BATCH_SIZE):
+    """
+    Recompute, across a process pool, only the songs whose feature
+    fingerprint doesn't match the current extractor / matcher settings
+    Songs without a recorded source file can't be recomputed and are listed
+    """
+    fingerprint = feature_fingerprint(FeatureExtractor(sr=16000))
+    stale = stale_songs(fingerprint)
+    workers = workers or os.cpu_count() or 1
+    
+    jobs = []
+    missing = []
+    for song in stale:
+        if song.source_path and os.path.exists(song.source_path):
+            segment = None if song.segment_start is None else (song.segment_start, song.segment_end)
+            jobs.append((song.id, song.source_path, song.feature_path, segment))
+        else:
+            missing.append(song)
+    
+    print("="*60)
+    print(f"🔁 {len(stale)} stale songs (current fingerprint {fingerprint}), "
+          f"re-extracting {len(jobs)} with {workers} workers")
+    print("="*60)
+    
+    for song in missing:
+        print(f"⚠️ No source audio for ID {song.id}: {song.title} (re-add it to refresh)")
+    
+    updated = failed = 0
+    batch = []
+    
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = {pool.submit(_reextract, job): job for job in jobs}
+            
+            for future in as_completed(futures):
+                try:
+                    batch.append(future.result())
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ Error re-extracting song ID {futures[future][0]}: {e}")
+                    continue
+                
+                if len(batch) >= batch_size:
+                    update_songs(batch)
+                    updated += len(batch)
+                    batch = []
+        
+        if batch:
+            update_songs(batch)
+            updated += len(batch)
+    
+    print("="*60)
+    print(f"✅ Updated {updated} | ❌ Failed {failed} | ⚠️ No source {len(missing)}")
+    print("="*60)
+    return updated, failed, len(missing)
+
+if __name__ == "__main__":
+    reextract(int(sys.argv[1]) if len(sys.argv) > 1 else None)
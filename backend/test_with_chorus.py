@@ -1,6 +1,5 @@
 import sys
-import librosa
-import soundfile as sf
+from utils.audio_processor import load_audio
 from utils.feature_extractor import FeatureExtractor
 from utils.similarity import SimilarityMatcher
 from models.database import get_all_songs
@@ -15,18 +14,14 @@ def test_chorus_section(audio_path, start_sec, end_sec):
     print("="*60)
     
     # Load and extract section
-    y_full, sr = librosa.load(audio_path, sr=16000)
+    y_full, sr = load_audio(audio_path, sr=16000)
     start_sample = int(start_sec * sr)
     end_sample = int(end_sec * sr)
     y_section = y_full[start_sample:end_sample]
     
-    # Save temp file
-    temp_file = "temp_test.wav"
-    sf.write(temp_file, y_section, sr)
-    
-    # Extract features
+    # Extract features straight from the slice
     extractor = FeatureExtractor(sr=16000)
-    test_features = extractor.extract_features(temp_file)
+    test_features = extractor.extract_features(y_section, profile='melody', sr=sr)
     
     # Compare with all songs
     songs = get_all_songs()
@@ -63,10 +58,6 @@ def test_chorus_section(audio_path, start_sec, end_sec):
         print(f"   Pitch: {result['pitch']:.2f}%")
     
     print("\n" + "="*60)
-    
-    # Clean up
-    import os
-    os.remove(temp_file)
 
 if __name__ == "__main__":
     if len(sys.argv) < 4:
@@ -13,7 +13,7 @@ def test_audio_file(audio_path):
     
     # Extract features
     extractor = FeatureExtractor(sr=16000)
-    test_features = extractor.extract_features(audio_path)
+    test_features = extractor.extract_features(audio_path, profile='melody')
     
     # Get all songs
     songs = get_all_songs()
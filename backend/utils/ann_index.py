@@ -0,0 +1,132 @@
+import numpy as np
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index (cosine similarity)
+    Vectors are clustered with k-means; a query only scans the lists of
+    its n_probe closest centroids, so search is sublinear in catalog size
+    """
+    def __init__(self, n_lists=None, n_probe=16, seed=0):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.seed = seed
+        self.centroids = None
+        self.keys = []
+        self.sources = None
+        self._rows = {}
+        self.vectors = None
+        self.assignments = None
+        self.lists = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def build(self, keys, vectors, iterations=20, sources=None):
+        """
+        Train centroids on the vectors and index all of them
+        sources: optional string per key identifying what was embedded
+        (see matches)
+        """
+        vectors = self._normalize(np.asarray(vectors, dtype=np.float32))
+        n_lists = self.n_lists or max(1, int(np.sqrt(len(vectors))))
+        self.n_lists = min(n_lists, len(vectors))
+
+        self.centroids = self._kmeans(vectors, self.n_lists, iterations)
+        self.keys = list(keys)
+        self.sources = list(sources) if sources is not None else None
+        self._rows = {key: row for row, key in enumerate(self.keys)}
+        self.vectors = vectors
+        self.assignments = np.argmax(vectors @ self.centroids.T, axis=1)
+        self._rebuild_lists()
+        return self
+
+    def add(self, key, vector, source=None):
+        """Index one more vector with the existing centroids"""
+        vector = self._normalize(np.asarray(vector, dtype=np.float32)[None, :])
+        assignment = int(np.argmax(vector @ self.centroids.T))
+
+        self._rows[key] = len(self.keys)
+        self.keys.append(key)
+        if self.sources is not None:
+            self.sources.append(source or '')
+        self.vectors = np.vstack([self.vectors, vector])
+        self.assignments = np.append(self.assignments, assignment)
+        self.lists[assignment] = np.append(self.lists[assignment], len(self.keys) - 1)
+
+    def matches(self, key, source):
+        """
+        True if key is indexed from the same source (an index saved
+        without sources never matches: its keys may have been reused)
+        """
+        if self.sources is None or key not in self._rows:
+            return False
+        return self.sources[self._rows[key]] == source
+
+    def search(self, vector, limit=100):
+        """Keys of the (approximately) closest vectors, best first"""
+        if len(self.keys) == 0:
+            return []
+
+        vector = self._normalize(np.asarray(vector, dtype=np.float32)[None, :])[0]
+        probes = np.argsort(-(self.centroids @ vector))[:self.n_probe]
+        candidates = np.concatenate([self.lists[p] for p in probes])
+
+        if len(candidates) == 0:
+            return []
+
+        scores = self.vectors[candidates] @ vector
+        best = candidates[np.argsort(-scores, kind='stable')[:limit]]
+        return [self.keys[i] for i in best]
+
+    def save(self, path):
+        """Save index to .npz file"""
+        extra = {'sources': np.array(self.sources, dtype=str)} if self.sources is not None else {}
+        np.savez(
+            path,
+            centroids=self.centroids,
+            keys=np.array(self.keys),
+            vectors=self.vectors,
+            assignments=self.assignments,
+            n_probe=self.n_probe,
+            **extra
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Load index from .npz file"""
+        data = np.load(path)
+        index = cls(n_lists=len(data['centroids']), n_probe=int(data['n_probe']))
+        index.centroids = data['centroids']
+        index.keys = data['keys'].tolist()
+        index.sources = data['sources'].tolist() if 'sources' in data else None
+        index._rows = {key: row for row, key in enumerate(index.keys)}
+        index.vectors = data['vectors']
+        index.assignments = data['assignments']
+        index._rebuild_lists()
+        return index
+
+    def _rebuild_lists(self):
+        """Inverted lists: vector rows per centroid"""
+        order = np.argsort(self.assignments, kind='stable')
+        bounds = np.searchsorted(self.assignments[order], np.arange(self.n_lists + 1))
+        self.lists = [order[bounds[c]:bounds[c + 1]] for c in range(self.n_lists)]
+
+    def _kmeans(self, vectors, k, iterations):
+        """Spherical k-means on unit vectors"""
+        rng = np.random.default_rng(self.seed)
+        centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            for c in range(k):
+                members = vectors[assignments == c]
+                if len(members) > 0:
+                    centroids[c] = members.sum(axis=0)
+            centroids = self._normalize(centroids)
+
+        return centroids
+
+    def _normalize(self, vectors):
+        """Unit-length rows (zero rows stay zero)"""
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1)
@@ -1,19 +1,36 @@
 import librosa
 import numpy as np
 from scipy import signal
+from utils.decoder import decode_audio, resample
 
-def load_audio(file_path, sr=16000):
-    """Load audio file and convert to mono"""
+def load_audio(source, sr=16000, source_sr=None):
+    """
+    Load audio and convert to mono at sr
+    source: file path, bytes / file-like buffer, or a numpy array
+    (arrays need source_sr; multi-channel arrays are (channels, samples))
+    """
     try:
-        y, sr = librosa.load(file_path, sr=sr, mono=True)
-        return y, sr
+        if isinstance(source, np.ndarray):
+            if source_sr is None:
+                raise ValueError("source_sr is required for array input")
+            y = np.asarray(source, dtype=np.float32)
+            if y.ndim > 1:
+                y = librosa.to_mono(y)
+            return resample(y, source_sr, sr), sr
+        
+        # soundfile or an ffmpeg pipe, never audioread
+        return decode_audio(source, sr=sr)
     except Exception as e:
         raise Exception(f"Error loading audio: {str(e)}")
 
+def highpass_sos(sr):
+    """100 Hz high-pass used for noise reduction (second-order sections)"""
+    return signal.butter(10, 100, 'hp', fs=sr, output='sos')
+
 def reduce_noise(y, sr):
     """Basic noise reduction using spectral gating"""
     # Simple noise reduction: high-pass filter
-    sos = signal.butter(10, 100, 'hp', fs=sr, output='sos')
+    sos = highpass_sos(sr)
     filtered = signal.sosfilt(sos, y)
     return filtered
 
@@ -0,0 +1,159 @@
+import os
+import shutil
+import numpy as np
+
+# Column name -> dtype; every column is one contiguous array for all songs
+CATALOG_COLUMNS = {
+    'pitch': np.float32,
+    'intervals': np.float32,
+    'contour': np.int8,
+    'frames': np.int32,
+    'intervals_paa4': np.float32,
+    'intervals_paa16': np.float32,
+    'notes': np.float32,
+}
+
+# Song columns the packed features came from; a row is only used while
+# the database row still has the same values (ids are reused after a
+# delete, re-extraction rewrites features under the same id)
+SOURCE_FIELDS = ('feature_path', 'feature_fingerprint', 'content_hash')
+
+def song_source(song):
+    """A song row's SOURCE_FIELDS values"""
+    return {field: getattr(song, field) for field in SOURCE_FIELDS}
+
+def source_key(source):
+    """SOURCE_FIELDS values as one string ('' for missing), e.g. for IVFIndex sources"""
+    return '\n'.join(str(source.get(field) or '') for field in SOURCE_FIELDS)
+
+def write_catalog(entries, directory):
+    """
+    Write a columnar catalog: <column>.npy (all songs back to back),
+    <column>_offsets.npy (row ranges per song), song_ids.npy and one
+    <field>.npy per SOURCE_FIELDS
+    entries: iterable of (song_id, source, features); source maps
+    SOURCE_FIELDS to the song's values, features has every CATALOG_COLUMNS key
+    Each build is a new numbered generation under directory and readers
+    open the newest, so files a running server has mapped are never
+    replaced (Windows can't delete or overwrite mapped files)
+    """
+    song_ids = []
+    sources = {field: [] for field in SOURCE_FIELDS}
+    columns = {name: [] for name in CATALOG_COLUMNS}
+
+    for song_id, source, features in entries:
+        song_ids.append(song_id)
+        for field in SOURCE_FIELDS:
+            sources[field].append(source.get(field) or '')
+        for name, dtype in CATALOG_COLUMNS.items():
+            columns[name].append(np.asarray(features[name], dtype=dtype))
+
+    os.makedirs(directory, exist_ok=True)
+    generations = _generations(directory)
+    generation = str(generations[-1] + 1 if generations else 1)
+    staging = os.path.join(directory, generation + '.tmp')
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    np.save(os.path.join(staging, 'song_ids.npy'), np.array(song_ids, dtype=np.int64))
+    for field, values in sources.items():
+        np.save(os.path.join(staging, f'{field}.npy'), np.array(values, dtype=str))
+    for name, dtype in CATALOG_COLUMNS.items():
+        rows = [len(values) for values in columns[name]]
+        offsets = np.concatenate([[0], np.cumsum(rows)]).astype(np.int64)
+        shape = (0, 2) if name == 'notes' else (0,)
+        data = np.concatenate(columns[name]) if columns[name] else np.zeros(shape, dtype=dtype)
+        np.save(os.path.join(staging, f'{name}.npy'), data.astype(dtype))
+        np.save(os.path.join(staging, f'{name}_offsets.npy'), offsets)
+
+    # A fresh name, so the rename never touches files someone has open
+    os.rename(staging, os.path.join(directory, generation))
+
+    # Keep the previous generation for readers that picked it just before
+    # the rename; older ones (and the pre-generation flat layout) go when
+    # nothing has them mapped any more
+    for old in generations[:-1]:
+        shutil.rmtree(os.path.join(directory, str(old)), ignore_errors=True)
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.endswith('.npy') and os.path.isfile(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def _generations(directory):
+    """Built generation numbers under directory, oldest first"""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        int(name) for name in os.listdir(directory)
+        if name.isdigit() and os.path.isdir(os.path.join(directory, name))
+    )
+
+def _current(directory):
+    """Directory holding the newest catalog files (None if none built)"""
+    generations = _generations(directory)
+    if generations:
+        return os.path.join(directory, str(generations[-1]))
+    # Catalogs written before generations: files directly in directory
+    if os.path.exists(os.path.join(directory, 'song_ids.npy')):
+        return directory
+    return None
+
+class FeatureCatalog:
+    """
+    Read-only, memory-mapped view of a catalog written by write_catalog
+    Opening maps the column files once; per-song features are zero-copy
+    slices, and processes mapping the same files share their pages
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        path = _current(directory)
+        if path is None:
+            raise FileNotFoundError(f"No catalog in {directory}")
+
+        self.song_ids = np.load(os.path.join(path, 'song_ids.npy'))
+        self.sources = {}
+        for field in SOURCE_FIELDS:
+            field_path = os.path.join(path, f'{field}.npy')
+            # Older catalogs don't record sources: never trusted
+            self.sources[field] = np.load(field_path) if os.path.exists(field_path) else None
+        self.columns = {}
+        self.offsets = {}
+        for name in CATALOG_COLUMNS:
+            self.columns[name] = np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+            self.offsets[name] = np.load(os.path.join(path, f'{name}_offsets.npy'))
+        self._rows = {int(song_id): row for row, song_id in enumerate(self.song_ids)}
+
+    def __len__(self):
+        return len(self.song_ids)
+
+    def __contains__(self, song_id):
+        return song_id in self._rows
+
+    def matches(self, song_id, source):
+        """True if song_id is packed from the same SOURCE_FIELDS values as source"""
+        if song_id not in self._rows:
+            return False
+        row = self._rows[song_id]
+        for field in SOURCE_FIELDS:
+            if self.sources[field] is None or self.sources[field][row] != (source.get(field) or ''):
+                return False
+        return True
+
+    def features(self, song_id):
+        """Feature dict of one song (views into the mapped columns)"""
+        row = self._rows[song_id]
+        return {
+            name: self.columns[name][self.offsets[name][row]:self.offsets[name][row + 1]]
+            for name in CATALOG_COLUMNS
+        }
+
+    @staticmethod
+    def version(directory):
+        """Changes whenever the catalog is rewritten (None if there is none)"""
+        path = _current(directory)
+        if path is None:
+            return None
+        return path, os.path.getmtime(os.path.join(path, 'song_ids.npy'))
@@ -0,0 +1,82 @@
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import numpy as np
+import soundfile as sf
+import soxr
+
+# Resolved once per process; None if ffmpeg isn't installed
+FFMPEG = shutil.which('ffmpeg')
+
+class DecodeError(Exception):
+    """Audio could not be decoded by soundfile or ffmpeg"""
+
+def decode_audio(source, sr=16000):
+    """
+    Decode audio to mono float32 at sr, in memory (MP4-family uploads
+    go through a temporary file, see _ffmpeg_decode)
+    source: file path, bytes or a file-like buffer
+    libsndfile formats (WAV, FLAC, OGG, MP3, ...) are read directly and
+    resampled with soxr; anything else (WebM, M4A, ...) is piped through
+    one ffmpeg process that downmixes and resamples on its way to stdout
+    Returns (y, sr)
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data, path = bytes(source), None
+    elif isinstance(source, (str, os.PathLike)):
+        data, path = None, os.fspath(source)
+    else:
+        data, path = source.read(), None
+
+    try:
+        y, native_sr = sf.read(path or io.BytesIO(data), dtype='float32', always_2d=True)
+    except (sf.LibsndfileError, RuntimeError, TypeError) as soundfile_error:
+        if FFMPEG is None:
+            raise DecodeError(f"Unsupported by soundfile and ffmpeg not found: {soundfile_error}")
+        return _ffmpeg_decode(path, data, sr), sr
+
+    return resample(y.mean(axis=1), native_sr, sr), sr
+
+def resample(y, source_sr, sr):
+    """One-pass soxr resampling of a mono signal (no-op at the same rate)"""
+    y = np.asarray(y, dtype=np.float32)
+    if source_sr == sr:
+        return y
+    return soxr.resample(y, source_sr, sr, quality='HQ')
+
+def _is_mp4(data):
+    """ISO base media (MP4 / M4A / MOV / 3GP): starts with an 'ftyp' box"""
+    return data[4:8] == b'ftyp'
+
+def _ffmpeg_decode(path, data, sr):
+    """
+    Raw float32 PCM from ffmpeg's stdout; input from path or stdin
+    MP4-family bytes go through a temporary file instead: their index
+    (moov atom) is often at the end, which ffmpeg can't seek to in a pipe
+    """
+    if path is None and _is_mp4(data):
+        fd, temp_path = tempfile.mkstemp(suffix='.mp4')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            return _ffmpeg_decode(temp_path, None, sr)
+        finally:
+            os.remove(temp_path)
+
+    command = [
+        FFMPEG, '-hide_banner', '-loglevel', 'error',
+        '-i', path or 'pipe:0',
+        '-f', 'f32le', '-acodec', 'pcm_f32le', '-ac', '1', '-ar', str(sr),
+        'pipe:1'
+    ]
+    if path:
+        process = subprocess.run(command, stdin=subprocess.DEVNULL, capture_output=True)
+    else:
+        process = subprocess.run(command, input=data, capture_output=True)
+
+    if process.returncode != 0:
+        raise DecodeError(f"ffmpeg failed: {process.stderr.decode(errors='replace').strip()}")
+
+    return np.frombuffer(process.stdout, dtype=np.float32).copy()
@@ -0,0 +1,303 @@
+import numpy as np
+from numba import njit, prange
+
+
+def band_width(n, m, band_ratio=0.1):
+    """
+    Sakoe-Chiba half-width (in frames) for an n x m alignment.
+    The band follows the (n-1, m-1) diagonal, so it is always wide
+    enough to connect the two corners.
+    """
+    if n <= 1 or m <= 1:
+        return max(n, m)
+    slope = max((m - 1) / (n - 1), (n - 1) / (m - 1))
+    return max(1, int(np.ceil(band_ratio * max(n, m))), int(np.ceil(slope)))
+
+
+@njit(cache=True)
+def _row_window(i, slope, window, m):
+    """Columns [lo, hi] of row i that lie inside the band"""
+    center = i * slope
+    lo = max(0, int(np.ceil(center - window)))
+    hi = min(m - 1, int(np.floor(center + window)))
+    return lo, hi
+
+
+@njit(cache=True)
+def _banded_dtw(x, y, window, max_dist):
+    """
+    Distance-only DTW with an absolute-difference cost.
+    Keeps two rows of the cost matrix -> O(m) memory, no warping path.
+    Returns inf as soon as a whole row exceeds max_dist (early abandon).
+    """
+    n = x.shape[0]
+    m = y.shape[0]
+    inf = np.inf
+    prev = np.full(m, inf)
+    curr = np.full(m, inf)
+    slope = (m - 1) / (n - 1) if n > 1 else 0.0
+    prev_lo = 0
+    prev_hi = -1
+
+    for i in range(n):
+        lo, hi = _row_window(i, slope, window, m)
+        xi = float(x[i])
+        row_min = inf
+
+        for j in range(lo, hi + 1):
+            cost = abs(xi - float(y[j]))
+            if i == 0 and j == 0:
+                best = 0.0
+            else:
+                best = inf
+                if prev_lo <= j <= prev_hi and prev[j] < best:
+                    best = prev[j]
+                if prev_lo <= j - 1 <= prev_hi and prev[j - 1] < best:
+                    best = prev[j - 1]
+                if j > lo and curr[j - 1] < best:
+                    best = curr[j - 1]
+            curr[j] = cost + best
+            if curr[j] < row_min:
+                row_min = curr[j]
+
+        # Costs only grow along a path, so no cell below can get back under budget
+        if row_min > max_dist:
+            return inf
+
+        prev, curr = curr, prev
+        prev_lo = lo
+        prev_hi = hi
+
+    return prev[m - 1]
+
+
+@njit(cache=True)
+def _lb_keogh(x, y, window):
+    """
+    LB_Keogh against the band envelope of y
+    Envelope is built with monotonic deques: O(n + m)
+    """
+    n = x.shape[0]
+    m = y.shape[0]
+    slope = (m - 1) / (n - 1) if n > 1 else 0.0
+    max_queue = np.empty(m, dtype=np.int64)
+    min_queue = np.empty(m, dtype=np.int64)
+    max_head = max_tail = 0
+    min_head = min_tail = 0
+    pushed = 0
+    total = 0.0
+
+    for i in range(n):
+        lo, hi = _row_window(i, slope, window, m)
+
+        while pushed <= hi:
+            value = y[pushed]
+            while max_tail > max_head and y[max_queue[max_tail - 1]] <= value:
+                max_tail -= 1
+            max_queue[max_tail] = pushed
+            max_tail += 1
+            while min_tail > min_head and y[min_queue[min_tail - 1]] >= value:
+                min_tail -= 1
+            min_queue[min_tail] = pushed
+            min_tail += 1
+            pushed += 1
+
+        while max_queue[max_head] < lo:
+            max_head += 1
+        while min_queue[min_head] < lo:
+            min_head += 1
+
+        xi = float(x[i])
+        upper = float(y[max_queue[max_head]])
+        lower = float(y[min_queue[min_head]])
+        if xi > upper:
+            total += xi - upper
+        elif xi < lower:
+            total += lower - xi
+
+    return total
+
+
+def lb_kim(x, y):
+    """
+    LB_Kim: every warping path starts at (0, 0) and ends at (n-1, m-1)
+    """
+    if len(x) == 0 or len(y) == 0:
+        return np.inf
+    if len(x) == 1 and len(y) == 1:
+        return float(abs(x[0] - y[0]))
+    return float(abs(x[0] - y[0]) + abs(x[-1] - y[-1]))
+
+
+def lb_keogh(x, y, band_ratio=0.1):
+    """
+    LB_Keogh lower bound of dtw_distance(x, y, band_ratio)
+    Every row of the band has to be visited, so each x[i] pays at least
+    its distance to the min/max of y inside that row
+    """
+    x = np.ascontiguousarray(x)
+    y = np.ascontiguousarray(y)
+
+    if len(x) == 0 or len(y) == 0:
+        return np.inf
+
+    window = band_width(len(x), len(y), band_ratio)
+    return float(_lb_keogh(x, y, window))
+
+
+def dtw_distance(x, y, band_ratio=0.1, max_dist=np.inf):
+    """
+    DTW distance between two 1-D sequences inside a Sakoe-Chiba band
+    Equivalent to fastdtw(..., dist=euclidean) on (n, 1) arrays, but exact
+    within the band and compiled
+    Returns inf once the distance is known to exceed max_dist
+    """
+    x = np.ascontiguousarray(x)
+    y = np.ascontiguousarray(y)
+
+    if len(x) == 0 or len(y) == 0:
+        return np.inf
+
+    window = band_width(len(x), len(y), band_ratio)
+    return float(_banded_dtw(x, y, window, float(max_dist)))
+
+
+@njit(parallel=True, cache=True)
+def _banded_dtw_many(x, flat, offsets, windows):
+    """One query against every packed reference, references in parallel"""
+    count = offsets.shape[0] - 1
+    out = np.empty(count)
+    for k in prange(count):
+        y = flat[offsets[k]:offsets[k + 1]]
+        if y.shape[0] == 0:
+            out[k] = np.inf
+        else:
+            out[k] = _banded_dtw(x, y, windows[k], np.inf)
+    return out
+
+
+def pack_sequences(sequences, dtype=np.float64):
+    """
+    Concatenate 1-D sequences into one flat array plus an offsets table
+    Sequence k is flat[offsets[k]:offsets[k + 1]]
+    """
+    offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+    np.cumsum([len(seq) for seq in sequences], out=offsets[1:])
+
+    if len(sequences) == 0:
+        return np.empty(0, dtype=dtype), offsets
+
+    flat = np.concatenate([np.asarray(seq, dtype=dtype) for seq in sequences])
+    return flat, offsets
+
+
+def dtw_distance_many(x, flat, offsets, band_ratio=0.1):
+    """
+    Banded DTW distance from x to every sequence in a packed catalog
+    Returns one distance per sequence (inf for empty sequences)
+    """
+    x = np.ascontiguousarray(x)
+    lengths = np.diff(offsets)
+
+    if len(x) == 0:
+        return np.full(len(lengths), np.inf)
+
+    windows = np.array(
+        [band_width(len(x), int(m), band_ratio) for m in lengths],
+        dtype=np.int64
+    )
+    return _banded_dtw_many(x, np.ascontiguousarray(flat), offsets, windows)
+
+
+@njit(cache=True)
+def _subsequence_dtw(x, y):
+    """
+    Open-begin / open-end DTW: best alignment of all of x to any region of y
+    Tracks where each path started, so the span costs O(m) memory too
+    """
+    n = x.shape[0]
+    m = y.shape[0]
+    prev = np.empty(m)
+    curr = np.empty(m)
+    prev_start = np.empty(m, dtype=np.int64)
+    curr_start = np.empty(m, dtype=np.int64)
+
+    # Free start: the first query element may align anywhere in y
+    x0 = float(x[0])
+    for j in range(m):
+        prev[j] = abs(x0 - float(y[j]))
+        prev_start[j] = j
+
+    for i in range(1, n):
+        xi = float(x[i])
+        for j in range(m):
+            best = prev[j]
+            start = prev_start[j]
+            if j > 0:
+                if prev[j - 1] < best:
+                    best = prev[j - 1]
+                    start = prev_start[j - 1]
+                if curr[j - 1] < best:
+                    best = curr[j - 1]
+                    start = curr_start[j - 1]
+            curr[j] = abs(xi - float(y[j])) + best
+            curr_start[j] = start
+        prev, curr = curr, prev
+        prev_start, curr_start = curr_start, prev_start
+
+    # Free end: pick the cheapest last column
+    end = 0
+    for j in range(1, m):
+        if prev[j] < prev[end]:
+            end = j
+
+    return prev[end], prev_start[end], end
+
+
+@njit(parallel=True, cache=True)
+def _subsequence_dtw_many(x, flat, offsets):
+    """Subsequence DTW of one query inside every packed reference"""
+    count = offsets.shape[0] - 1
+    distances = np.empty(count)
+    starts = np.zeros(count, dtype=np.int64)
+    ends = np.zeros(count, dtype=np.int64)
+    for k in prange(count):
+        y = flat[offsets[k]:offsets[k + 1]]
+        if y.shape[0] == 0:
+            distances[k] = np.inf
+        else:
+            distances[k], starts[k], ends[k] = _subsequence_dtw(x, y)
+    return distances, starts, ends
+
+
+def subsequence_dtw(x, y):
+    """
+    Best-matching region of y for the whole of x, in one O(n*m) pass
+    Returns (distance, start, end) with y[start:end + 1] the matched region
+    """
+    x = np.ascontiguousarray(x)
+    y = np.ascontiguousarray(y)
+
+    if len(x) == 0 or len(y) == 0:
+        return np.inf, 0, 0
+
+    distance, start, end = _subsequence_dtw(x, y)
+    return float(distance), int(start), int(end)
+
+
+def subsequence_dtw_many(x, flat, offsets):
+    """
+    subsequence_dtw of x against every sequence in a packed catalog
+    Returns (distances, starts, ends) arrays
+    """
+    x = np.ascontiguousarray(x)
+    count = len(offsets) - 1
+
+    if len(x) == 0:
+        return (
+            np.full(count, np.inf),
+            np.zeros(count, dtype=np.int64),
+            np.zeros(count, dtype=np.int64)
+        )
+
+    return _subsequence_dtw_many(x, np.ascontiguousarray(flat), offsets)
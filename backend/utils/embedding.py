@@ -0,0 +1,66 @@
+import numpy as np
+
+# Block sizes of the embedding
+HISTOGRAM_BINS = 16
+CURVE_POINTS = 32
+CONTOUR_NGRAM = 3
+
+EMBEDDING_DIM = HISTOGRAM_BINS + 3 ** CONTOUR_NGRAM + CURVE_POINTS
+
+def interval_histogram(intervals, bins=HISTOGRAM_BINS):
+    """Distribution of normalized intervals (key- and tempo-invariant)"""
+    hist, _ = np.histogram(np.clip(intervals, -3, 3), bins=bins, range=(-3, 3))
+    return hist.astype(np.float32)
+
+def contour_ngram_tf(contour, n=CONTOUR_NGRAM):
+    """Term frequencies of contour n-grams over the -1/0/+1 alphabet"""
+    tf = np.zeros(3 ** n, dtype=np.float32)
+    if len(contour) < n:
+        return tf
+
+    digits = np.asarray(contour, dtype=np.int64) + 1
+    codes = np.zeros(len(digits) - n + 1, dtype=np.int64)
+    for offset in range(n):
+        codes = codes * 3 + digits[offset:len(digits) - n + 1 + offset]
+
+    np.add.at(tf, codes, 1)
+    return tf
+
+def resampled_curve(intervals, points=CURVE_POINTS):
+    """
+    Relative melody curve (cumulative intervals) resampled to a fixed length
+    Resampling removes tempo, zero mean / unit std removes key and range
+    """
+    curve = np.cumsum(intervals)
+    resampled = np.interp(
+        np.linspace(0, len(curve) - 1, points),
+        np.arange(len(curve)),
+        curve
+    )
+    resampled -= resampled.mean()
+    if resampled.std() > 0:
+        resampled /= resampled.std()
+    return resampled.astype(np.float32)
+
+def melody_embedding(melody):
+    """
+    Fixed-length, L2-normalized embedding of a prepared melody
+    (SimilarityMatcher.prepare output): interval histogram + contour
+    n-gram TF + resampled interval curve, each block unit-normalized
+    Returns zeros for melodies too short to match
+    """
+    intervals = np.asarray(melody['intervals'], dtype=float)
+    contour = np.asarray(melody['contour'])
+
+    if len(intervals) < 5:
+        return np.zeros(EMBEDDING_DIM, dtype=np.float32)
+
+    blocks = [
+        interval_histogram(intervals),
+        contour_ngram_tf(contour),
+        resampled_curve(intervals)
+    ]
+    blocks = [block / (np.linalg.norm(block) or 1.0) for block in blocks]
+
+    embedding = np.concatenate(blocks)
+    return embedding / (np.linalg.norm(embedding) or 1.0)
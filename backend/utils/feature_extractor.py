@@ -1,56 +1,172 @@
+import os
 import librosa
 import numpy as np
 from utils.audio_processor import load_audio, reduce_noise, normalize_audio
+from utils.pitch_tracker import track_pitch, PITCH_TRACKERS, FRAME_LENGTH, HOP_LENGTH
+from utils.notes import transcribe_notes
+
+# Named extraction profiles: which feature groups get computed
+# 'melody' is all SimilarityMatcher needs (queries), 'full' is for ingest
+FEATURE_PROFILES = {
+    'melody': ('pitch',),
+    'full': ('mfcc', 'chroma', 'pitch', 'spectral_centroid'),
+}
+
+# Feature groups derived from the shared magnitude spectrogram
+SPECTRAL_FEATURES = {'mfcc', 'chroma', 'spectral_centroid'}
+
+# Compact storage: pitch as int16 cents re A4, voicing as uint8, interval
+# sequences as int8 in 1/INTERVAL_STEPS std steps, contour as int8, notes
+# as float16; spectral features go to a float16 sidecar matching never reads
+COMPACT_VERSION = 1
+UNVOICED_CENTS = np.iinfo(np.int16).min
+INTERVAL_STEPS = 16
+INTERVAL_KEYS = ('intervals', 'intervals_paa4', 'intervals_paa16')
+
+def spectral_path(feature_path):
+    """Sidecar file holding a compact feature file's spectral features"""
+    base, ext = os.path.splitext(feature_path)
+    return f"{base}_spectral{ext}"
+
+def compact_features(features):
+    """Quantize a feature dict; returns (compact dict, spectral dict)"""
+    compact = {'compact': COMPACT_VERSION}
+    spectral = {}
+    
+    for key, value in features.items():
+        if key in SPECTRAL_FEATURES:
+            spectral[key] = np.asarray(value, dtype=np.float16)
+        elif key == 'pitch':
+            pitch = np.asarray(value, dtype=float)
+            cents = np.full(len(pitch), UNVOICED_CENTS, dtype=np.int16)
+            voiced = pitch > 0
+            cents[voiced] = np.round(1200 * np.log2(pitch[voiced] / 440.0))
+            compact[key] = cents
+        elif key == 'voiced_probs':
+            compact[key] = np.round(np.clip(np.asarray(value, dtype=float), 0, 1) * 255).astype(np.uint8)
+        elif key in INTERVAL_KEYS:
+            steps = np.round(np.asarray(value, dtype=float) * INTERVAL_STEPS)
+            compact[key] = np.clip(steps, -127, 127).astype(np.int8)
+        elif key == 'contour':
+            compact[key] = np.asarray(value).astype(np.int8)
+        elif key == 'notes':
+            compact[key] = np.asarray(value, dtype=np.float16)
+        else:
+            compact[key] = value
+    
+    return compact, spectral
+
+def expand_features(stored):
+    """Inverse of compact_features (float arrays again); other dicts pass through"""
+    if 'compact' not in stored:
+        return stored
+    
+    features = {}
+    for key, value in stored.items():
+        if key == 'compact':
+            continue
+        if key == 'pitch':
+            voiced = value != UNVOICED_CENTS
+            features[key] = np.where(voiced, 440.0 * 2 ** (value / 1200.0), 0.0).astype(np.float32)
+        elif key == 'voiced_probs':
+            features[key] = value.astype(np.float32) / 255
+        elif key in INTERVAL_KEYS:
+            features[key] = value.astype(np.float32) / INTERVAL_STEPS
+        elif key in ('contour', 'notes'):
+            features[key] = value.astype(np.float32)
+        else:
+            features[key] = value
+    
+    return features
 
 class FeatureExtractor:
-    def __init__(self, sr=16000, n_mfcc=13, n_chroma=12):
+    def __init__(self, sr=16000, n_mfcc=13, n_chroma=12, pitch_tracker='pyin'):
+        if pitch_tracker not in PITCH_TRACKERS:
+            raise ValueError(f"Unknown pitch tracker: {pitch_tracker}")
         self.sr = sr
         self.n_mfcc = n_mfcc
         self.n_chroma = n_chroma
+        self.pitch_tracker = pitch_tracker
     
-    def extract_features(self, audio_path):
+    def extract_features(self, audio, profile='full', sr=None):
         """
         Extract MFCC, Chroma, and Pitch features from audio
-        Returns a dictionary with all features
+        audio: file path, bytes / file-like buffer, or a numpy array
+        (pass its sample rate as sr; resampled only if it isn't self.sr)
+        profile: 'melody' (pitch only), 'full', or an iterable of
+        feature groups ('mfcc', 'chroma', 'pitch', 'spectral_centroid')
+        Returns a dictionary with the requested features
         """
+        groups = FEATURE_PROFILES[profile] if isinstance(profile, str) else tuple(profile)
+        
+        unknown = set(groups) - set(FEATURE_PROFILES['full'])
+        if unknown:
+            raise ValueError(f"Unknown feature groups: {sorted(unknown)}")
+        
         # Load and preprocess audio
-        y, sr = load_audio(audio_path, sr=self.sr)
+        y, sr = load_audio(audio, sr=self.sr, source_sr=sr)
         y = reduce_noise(y, sr)
-        y = normalize_audio(y)
+        y = normalize_audio(y).astype(np.float32)
         
         features = {}
         
+        # One magnitude STFT shared by every spectral feature
+        if set(groups) & SPECTRAL_FEATURES:
+            magnitude = np.abs(librosa.stft(y, n_fft=FRAME_LENGTH, hop_length=HOP_LENGTH))
+            power = magnitude ** 2
+        
         # 1. MFCC (Mel-frequency cepstral coefficients)
-        mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=self.n_mfcc)
-        mfcc_delta = librosa.feature.delta(mfcc)
-        features['mfcc'] = np.concatenate([mfcc, mfcc_delta], axis=0)
+        if 'mfcc' in groups:
+            mel = librosa.feature.melspectrogram(S=power, sr=sr)
+            mfcc = librosa.feature.mfcc(S=librosa.power_to_db(mel), n_mfcc=self.n_mfcc)
+            mfcc_delta = librosa.feature.delta(mfcc)
+            features['mfcc'] = np.concatenate([mfcc, mfcc_delta], axis=0).astype(np.float32)
         
         # 2. Chroma features
-        chroma = librosa.feature.chroma_stft(y=y, sr=sr, n_chroma=self.n_chroma)
-        features['chroma'] = chroma
-        
-        # 3. Pitch contour (F0 - fundamental frequency)
-        f0, voiced_flag, voiced_probs = librosa.pyin(
-            y, 
-            fmin=librosa.note_to_hz('C2'),
-            fmax=librosa.note_to_hz('C7'),
-            sr=sr
-        )
-        # Replace NaN with 0 and normalize
-        f0 = np.nan_to_num(f0)
-        features['pitch'] = f0
-        features['voiced_probs'] = voiced_probs
+        if 'chroma' in groups:
+            chroma = librosa.feature.chroma_stft(S=power, sr=sr, n_chroma=self.n_chroma)
+            features['chroma'] = chroma.astype(np.float32)
+        
+        # 3. Pitch contour (F0 - fundamental frequency), 0 = unvoiced
+        if 'pitch' in groups:
+            f0, voiced_probs = track_pitch(y, sr, self.pitch_tracker)
+            features['pitch'] = f0
+            features['voiced_probs'] = voiced_probs
+            # (semitones, seconds) note events for 'notes' matching
+            features['notes'] = transcribe_notes(f0, sr, HOP_LENGTH)
         
         # 4. Spectral features (bonus)
-        spectral_centroid = librosa.feature.spectral_centroid(y=y, sr=sr)
-        features['spectral_centroid'] = spectral_centroid
+        if 'spectral_centroid' in groups:
+            spectral_centroid = librosa.feature.spectral_centroid(S=magnitude, sr=sr)
+            features['spectral_centroid'] = spectral_centroid.astype(np.float32)
         
         return features
     
-    def save_features(self, features, output_path):
-        """Save features to .npy file"""
-        np.save(output_path, features, allow_pickle=True)
+    def save_features(self, features, output_path, compact=True):
+        """
+        Save features to .npy file
+        compact: quantized melody features, spectral features (if any) in
+        a separate sidecar file; compact=False keeps the full-precision dict
+        """
+        if not compact:
+            np.save(output_path, features, allow_pickle=True)
+            return
+        
+        stored, spectral = compact_features(features)
+        np.save(output_path, stored, allow_pickle=True)
+        if spectral:
+            np.save(spectral_path(output_path), spectral, allow_pickle=True)
     
-    def load_features(self, feature_path):
-        """Load features from .npy file"""
-        return np.load(feature_path, allow_pickle=True).item()
\ No newline at end of file
+    def load_features(self, feature_path, spectral=False):
+        """
+        Load features from .npy file (compact or full-precision)
+        spectral: also load a compact file's spectral sidecar
+        """
+        stored = np.load(feature_path, allow_pickle=True).item()
+        features = expand_features(stored)
+        
+        if spectral and 'compact' in stored and os.path.exists(spectral_path(feature_path)):
+            sidecar = np.load(spectral_path(feature_path), allow_pickle=True).item()
+            features.update({key: value.astype(np.float32) for key, value in sidecar.items()})
+        
+        return features
@@ -0,0 +1,55 @@
+import hashlib
+import json
+from utils.feature_extractor import COMPACT_VERSION, INTERVAL_STEPS
+from utils.notes import NOTE_SPLIT_SEMITONES, MIN_NOTE_SECONDS
+from utils.pitch_tracker import FRAME_LENGTH, HOP_LENGTH, FULL_RANGE, HUM_RANGE
+from utils.similarity import (
+    VOICED_PROB_PERCENTILE,
+    MIN_VOICED_PROB,
+    MIN_SELECTED_FRACTION,
+    SMOOTHING_FRAMES,
+    OUTLIER_SEMITONES,
+    PYRAMID_FACTORS
+)
+
+# Bump when stored features change in a way the settings below don't
+# capture (e.g. a new interval normalization in pitch_to_relative)
+FEATURE_VERSION = 1
+
+def feature_config(extractor):
+    """Every setting that changes what gets stored for a song"""
+    return {
+        'version': FEATURE_VERSION,
+        'sr': extractor.sr,
+        'n_mfcc': extractor.n_mfcc,
+        'n_chroma': extractor.n_chroma,
+        'pitch_tracker': extractor.pitch_tracker,
+        'frame_length': FRAME_LENGTH,
+        'hop_length': HOP_LENGTH,
+        'note_ranges': [list(FULL_RANGE), list(HUM_RANGE)],
+        'voiced_prob_percentile': VOICED_PROB_PERCENTILE,
+        'min_voiced_prob': MIN_VOICED_PROB,
+        'min_selected_fraction': MIN_SELECTED_FRACTION,
+        'smoothing_frames': SMOOTHING_FRAMES,
+        'outlier_semitones': OUTLIER_SEMITONES,
+        'pyramid_factors': list(PYRAMID_FACTORS),
+        'note_split_semitones': NOTE_SPLIT_SEMITONES,
+        'min_note_seconds': MIN_NOTE_SECONDS,
+        'compact_version': COMPACT_VERSION,
+        'interval_steps': INTERVAL_STEPS,
+    }
+
+def feature_fingerprint(extractor):
+    """Short, stable hash of feature_config"""
+    config = json.dumps(feature_config(extractor), sort_keys=True)
+    return hashlib.sha1(config.encode('utf-8')).hexdigest()[:16]
+
+def stamp_features(features, extractor, content_hash):
+    """Record the fingerprint and source hash in features['meta']; returns the fingerprint"""
+    fingerprint = feature_fingerprint(extractor)
+    features['meta'] = {
+        'fingerprint': fingerprint,
+        'content_hash': content_hash,
+        'config': feature_config(extractor)
+    }
+    return fingerprint
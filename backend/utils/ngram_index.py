@@ -0,0 +1,121 @@
+import math
+import numpy as np
+from collections import Counter, defaultdict
+
+# Coarse interval levels: big down, down, same, up, big up
+INTERVAL_BIN_EDGES = np.array([-1.5, -0.2, 0.2, 1.5])
+
+class NGramIndex:
+    """
+    Inverted index over melodic n-grams for candidate retrieval
+    Tokens are n-grams of the contour (-1/0/+1) and of coarsely quantized
+    intervals, with repeated steps collapsed so held notes and tempo don't
+    change the tokens. Songs are ranked by IDF-weighted shared n-grams,
+    with sublinear TF and a per-song length norm so long tracks don't
+    win on token count alone.
+    """
+    def __init__(self, contour_n=8, interval_n=5):
+        self.contour_n = contour_n
+        self.interval_n = interval_n
+        self.postings = defaultdict(dict)  # token -> {key: count}
+        self.doc_tokens = {}               # key -> Counter of its tokens
+        self.doc_norms = {}                # key -> length norm of its TF vector
+
+    def __len__(self):
+        return len(self.doc_tokens)
+
+    def tokens(self, melody):
+        """
+        Count the n-gram tokens of a prepared melody (intervals + contour)
+        """
+        contour = np.asarray(melody['contour'])
+        coarse = np.digitize(np.asarray(melody['intervals']), INTERVAL_BIN_EDGES) - 2
+
+        counts = Counter()
+        counts.update(('c',) + gram for gram in self._ngrams(contour, self.contour_n))
+        counts.update(('i',) + gram for gram in self._ngrams(coarse, self.interval_n))
+        return counts
+
+    def add(self, key, melody):
+        """Index (or re-index) one song"""
+        if key in self.doc_tokens:
+            self.remove(key)
+
+        self._insert(key, self.tokens(melody))
+
+    def remove(self, key):
+        """Drop one song from the index"""
+        counts = self.doc_tokens.pop(key, None)
+        if counts is None:
+            return
+        del self.doc_norms[key]
+
+        for token in counts:
+            docs = self.postings[token]
+            docs.pop(key, None)
+            if not docs:
+                del self.postings[token]
+
+    def query(self, melody, limit=100):
+        """
+        Vote-ranked candidate keys for a query melody, best first
+        Only songs sharing at least one n-gram with the query get a vote
+        """
+        total_docs = len(self.doc_tokens)
+        votes = defaultdict(float)
+
+        for token, query_count in self.tokens(melody).items():
+            docs = self.postings.get(token)
+            if not docs:
+                continue
+
+            idf = math.log(1 + total_docs / len(docs))
+            query_weight = idf * self._tf(query_count)
+            for key, count in docs.items():
+                votes[key] += query_weight * self._tf(count)
+
+        ranked = sorted(
+            votes.items(),
+            key=lambda item: item[1] / self.doc_norms[item[0]],
+            reverse=True
+        )
+        return [key for key, _ in ranked[:limit]]
+
+    def save(self, path):
+        """Save index to .npy file"""
+        np.save(path, {
+            'contour_n': self.contour_n,
+            'interval_n': self.interval_n,
+            'doc_tokens': self.doc_tokens
+        }, allow_pickle=True)
+
+    @classmethod
+    def load(cls, path):
+        """Load index from .npy file"""
+        data = np.load(path, allow_pickle=True).item()
+        index = cls(contour_n=data['contour_n'], interval_n=data['interval_n'])
+        for key, counts in data['doc_tokens'].items():
+            index._insert(key, counts)
+        return index
+
+    def _insert(self, key, counts):
+        """Add a song's token counts to the postings"""
+        self.doc_tokens[key] = counts
+        self.doc_norms[key] = math.sqrt(sum(self._tf(c) ** 2 for c in counts.values())) or 1.0
+        for token, count in counts.items():
+            self.postings[token][key] = count
+
+    def _tf(self, count):
+        """Sublinear term frequency"""
+        return 1 + math.log(count)
+
+    def _ngrams(self, sequence, n):
+        """n-grams of a sequence after collapsing repeated symbols"""
+        if len(sequence) == 0:
+            return []
+
+        keep = np.ones(len(sequence), dtype=bool)
+        keep[1:] = sequence[1:] != sequence[:-1]
+        symbols = tuple(int(v) for v in sequence[keep])
+
+        return [symbols[i:i + n] for i in range(len(symbols) - n + 1)]
@@ -0,0 +1,60 @@
+import numpy as np
+from scipy.signal import medfilt
+
+# A note ends when the pitch leaves its running median by more than this
+NOTE_SPLIT_SEMITONES = 0.7
+
+# Shorter runs are glitches / transitions, not notes
+MIN_NOTE_SECONDS = 0.06
+
+def transcribe_notes(pitch, sr=16000, hop_length=512,
+                     split_semitones=NOTE_SPLIT_SEMITONES, min_duration=MIN_NOTE_SECONDS):
+    """
+    Segment a frame-level f0 track (0 = unvoiced) into note events
+    A note is a run of voiced frames that stays within split_semitones of
+    its running median; unvoiced frames always end a note
+    Returns an (n_notes, 2) float32 array of (semitones re A4, duration in s)
+    """
+    pitch = np.asarray(pitch, dtype=float)
+    voiced = pitch > 0
+
+    semitones = np.zeros(len(pitch))
+    semitones[voiced] = 12 * np.log2(pitch[voiced] / 440.0)
+
+    frame_seconds = hop_length / sr
+    min_frames = max(1, int(np.ceil(min_duration / frame_seconds)))
+    notes = []
+
+    # Voiced runs first, then pitch changes inside each run
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], voiced.astype(np.int8), [0]])))
+    for run_start, run_end in zip(edges[::2], edges[1::2]):
+        run = semitones[run_start:run_end]
+        if len(run) >= 5:
+            # Octave / single-frame tracker errors
+            run = medfilt(run, 5)
+
+        note_start = 0
+        for i in range(1, len(run) + 1):
+            if i < len(run) and abs(run[i] - np.median(run[note_start:i])) <= split_semitones:
+                continue
+            if i - note_start >= min_frames:
+                notes.append((np.median(run[note_start:i]), (i - note_start) * frame_seconds))
+            note_start = i
+
+    return np.array(notes, dtype=np.float32).reshape(-1, 2)
+
+def note_intervals(notes):
+    """
+    Key-invariant note sequence: semitone steps between consecutive notes,
+    normalized by their std like SimilarityMatcher.pitch_to_relative
+    """
+    notes = np.asarray(notes, dtype=float).reshape(-1, 2)
+
+    if len(notes) < 5:
+        return np.array([])
+
+    intervals = np.diff(notes[:, 0])
+    if np.std(intervals) > 0:
+        intervals = intervals / np.std(intervals)
+
+    return intervals
@@ -0,0 +1,158 @@
+import heapq
+import multiprocessing
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from utils.dtw import pack_sequences
+from utils.similarity import SimilarityMatcher
+from utils.search import CascadeSearch
+
+# Per-worker state, filled by _init_worker
+_worker = {}
+
+def _attach(name, shape, dtype):
+    """Attach to a shared block without copying it"""
+    try:
+        # Python 3.13+: don't let a worker's resource tracker unlink it
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+def _init_worker(layout, band_ratio, max_length_ratio, mode):
+    """Process pool initializer: attach catalog arrays, cap nested threads"""
+    from threadpoolctl import threadpool_limits
+    import numba
+
+    # One core per worker: no BLAS / numba oversubscription
+    _worker['limits'] = threadpool_limits(limits=1)
+    numba.set_num_threads(1)
+
+    _worker['blocks'] = []
+    for field, (name, shape, dtype) in layout.items():
+        shm, array = _attach(name, shape, dtype)
+        _worker['blocks'].append(shm)
+        _worker[field] = array
+
+    _worker['matcher'] = SimilarityMatcher(band_ratio=band_ratio, mode=mode)
+    _worker['max_length_ratio'] = max_length_ratio
+
+def _search_partition(query, start, stop, top_k):
+    """Cascade search over catalog rows [start, stop) inside a worker"""
+    intervals, interval_offsets = _worker['intervals'], _worker['interval_offsets']
+    contours, contour_offsets = _worker['contours'], _worker['contour_offsets']
+
+    partition = (
+        (index, {
+            'intervals': intervals[interval_offsets[index]:interval_offsets[index + 1]],
+            'contour': contours[contour_offsets[index]:contour_offsets[index + 1]]
+        })
+        for index in range(start, stop)
+    )
+
+    search = CascadeSearch(
+        _worker['matcher'],
+        top_k=top_k,
+        max_length_ratio=_worker['max_length_ratio']
+    )
+    results = search.search(query, partition)
+
+    return [(total, index, scores) for index, total, scores in results], search.stats
+
+class ParallelMatcher:
+    """
+    Multi-core catalog scan
+    The catalog's interval/contour sequences live in shared memory; each
+    worker runs CascadeSearch on its own slice and the per-worker top-k
+    lists are merged, so results match a single-process CascadeSearch
+    """
+    def __init__(self, catalog, workers=None, band_ratio=0.1, max_length_ratio=None, mode='global'):
+        """
+        catalog: iterable of (key, features) pairs, kept for the lifetime
+        of the matcher (close() releases the pool and shared memory)
+        mode: 'global' or 'notes' (the sequences shared are that mode's)
+        """
+        self.matcher = SimilarityMatcher(band_ratio=band_ratio, mode=mode)
+        self.workers = workers or os.cpu_count() or 1
+        self.stats = {}
+
+        catalog = list(catalog)
+        self.keys = [key for key, _ in catalog]
+        melodies = [self.matcher.prepare(features) for _, features in catalog]
+
+        intervals, interval_offsets = pack_sequences([m['intervals'] for m in melodies])
+        contours, contour_offsets = pack_sequences([m['contour'] for m in melodies])
+
+        self._blocks = []
+        layout = {}
+        for field, array in (
+            ('intervals', intervals),
+            ('interval_offsets', interval_offsets),
+            ('contours', contours),
+            ('contour_offsets', contour_offsets)
+        ):
+            layout[field] = self._share(array)
+
+        # Spawned, not forked: the server is multithreaded, and a fork taken
+        # while another thread holds a lock (numba, BLAS, I/O) can deadlock
+        # the worker (spawn is also the only start method on Windows)
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(layout, band_ratio, max_length_ratio, mode)
+        )
+
+    def search(self, query_features, top_k=5):
+        """
+        Returns the top_k (key, total_score, display_scores), best first.
+        Summed per-stage counters from all workers are left in self.stats
+        """
+        query = self.matcher.prepare(query_features)
+        count = len(self.keys)
+
+        # A few partitions per worker evens out uneven song lengths
+        bounds = np.linspace(0, count, min(count, self.workers * 4) + 1).astype(int)
+        futures = [
+            self._pool.submit(_search_partition, query, int(start), int(stop), top_k)
+            for start, stop in zip(bounds[:-1], bounds[1:])
+            if stop > start
+        ]
+
+        merged = []
+        totals = {}
+        for future in futures:
+            results, stats = future.result()
+            merged.extend(results)
+            for stage, value in stats.items():
+                totals[stage] = totals.get(stage, 0) + value
+        # Assigned whole: concurrent searches never see a half-summed dict
+        self.stats = totals
+
+        # Score desc, catalog order for ties (same as CascadeSearch)
+        best = heapq.nsmallest(top_k, merged, key=lambda r: (-r[0], r[1]))
+
+        return [(self.keys[index], total, scores) for total, index, scores in best]
+
+    def close(self):
+        """Stop the workers and free the shared catalog"""
+        self._pool.shutdown(wait=True)
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _share(self, array):
+        """Copy an array into a new shared block; returns its layout"""
+        array = np.ascontiguousarray(array)
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+        self._blocks.append(shm)
+        return shm.name, array.shape, array.dtype.str
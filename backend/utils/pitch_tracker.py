@@ -0,0 +1,150 @@
+import librosa
+import numpy as np
+
+# Frame grid shared by every backend (same as librosa.pyin's defaults),
+# so all of them return the same number of frames for the same audio
+FRAME_LENGTH = 2048
+HOP_LENGTH = 512
+
+# Full singing range for reference tracks, narrower range for hums
+FULL_RANGE = ('C2', 'C7')
+HUM_RANGE = ('E2', 'C6')
+
+def track_pitch(y, sr, tracker='pyin', center=True):
+    """
+    Run a pitch tracker backend on mono audio
+    Returns (pitch, voiced_probs): f0 in Hz with 0 for unvoiced frames,
+    and a 0-1 voicing confidence per frame
+    center=False frames y as-is (no padding), for pre-framed stream blocks
+    """
+    if tracker not in PITCH_TRACKERS:
+        raise ValueError(f"Unknown pitch tracker: {tracker}")
+    return PITCH_TRACKERS[tracker](y, sr, center=center)
+
+def pyin_tracker(y, sr, note_range=FULL_RANGE, center=True):
+    """Probabilistic YIN + HMM (librosa.pyin): most accurate, slowest"""
+    f0, voiced_flag, voiced_probs = librosa.pyin(
+        y,
+        fmin=librosa.note_to_hz(note_range[0]),
+        fmax=librosa.note_to_hz(note_range[1]),
+        sr=sr,
+        frame_length=FRAME_LENGTH,
+        hop_length=HOP_LENGTH,
+        center=center
+    )
+    # Replace NaN with 0
+    return np.nan_to_num(f0), voiced_probs
+
+def pyin_hum_tracker(y, sr, center=True):
+    """pyin over a hum-sized range (fewer pitch candidates per frame)"""
+    return pyin_tracker(y, sr, note_range=HUM_RANGE, center=center)
+
+def yin_tracker(y, sr, note_range=FULL_RANGE, silence_db=-40.0, center=True):
+    """
+    librosa.yin (no HMM decoding). YIN has no voicing output, so frames
+    are voiced by loudness relative to the loudest frame
+    """
+    f0 = librosa.yin(
+        y,
+        fmin=librosa.note_to_hz(note_range[0]),
+        fmax=librosa.note_to_hz(note_range[1]),
+        sr=sr,
+        frame_length=FRAME_LENGTH,
+        hop_length=HOP_LENGTH,
+        center=center
+    )
+    rms = librosa.feature.rms(
+        y=y, frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH, center=center
+    )[0]
+    rms_db = librosa.amplitude_to_db(rms, ref=np.max)
+
+    # -40 dB -> 0, -10 dB and louder -> 1
+    voiced_probs = np.clip((rms_db - silence_db) / 30.0, 0, 1)[:len(f0)]
+    f0 = np.where(voiced_probs >= 0.5, f0, 0.0)
+    return f0, voiced_probs
+
+def autocorr_tracker(y, sr, note_range=FULL_RANGE, threshold=0.1,
+                     voicing_threshold=0.25, block_frames=1024, center=True):
+    """
+    Vectorized YIN over framed audio: FFT cross-correlation gives the
+    difference function of a whole block of frames at once
+    Voicing confidence = 1 - CMNDF at the picked lag
+    """
+    min_lag = int(np.floor(sr / librosa.note_to_hz(note_range[1])))
+    max_lag = int(np.ceil(sr / librosa.note_to_hz(note_range[0])))
+    window = FRAME_LENGTH - max_lag
+    n_fft = 1 << int(np.ceil(np.log2(FRAME_LENGTH + window)))
+
+    # Same centering as librosa (center=True, zero padding)
+    padded = np.asarray(y, dtype=np.float64)
+    if center:
+        padded = np.pad(padded, FRAME_LENGTH // 2)
+    frames = librosa.util.frame(padded, frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH)
+
+    f0 = np.zeros(frames.shape[1])
+    voiced_probs = np.zeros(frames.shape[1])
+    lags = np.arange(max_lag + 1)
+
+    # Blocks of frames bound the FFT buffers for long inputs
+    for start in range(0, frames.shape[1], block_frames):
+        block = frames[:, start:start + block_frames]
+
+        # d(tau) = E(0) + E(tau) - 2 r(tau), r = cross-correlation
+        head = np.fft.rfft(block[:window], n=n_fft, axis=0)
+        full = np.fft.rfft(block, n=n_fft, axis=0)
+        r = np.fft.irfft(np.conj(head) * full, n=n_fft, axis=0)[:max_lag + 1]
+
+        energy = np.concatenate([np.zeros((1, block.shape[1])), np.cumsum(block ** 2, axis=0)])
+        shifted_energy = energy[lags + window] - energy[lags]
+        diff = np.maximum(shifted_energy[0] + shifted_energy - 2 * r, 0)
+
+        # Cumulative mean normalized difference
+        cumulative = np.cumsum(diff[1:], axis=0)
+        cmndf = np.ones_like(diff)
+        cmndf[1:] = diff[1:] * lags[1:, None] / np.maximum(cumulative, 1e-12)
+
+        search = cmndf[min_lag:max_lag + 1]
+
+        # First trough under threshold, else global minimum
+        troughs = np.zeros_like(search, dtype=bool)
+        troughs[1:-1] = (search[1:-1] < search[:-2]) & (search[1:-1] <= search[2:])
+        candidates = troughs & (search < threshold)
+        lag_index = np.where(
+            candidates.any(axis=0),
+            np.argmax(candidates, axis=0),
+            np.argmin(search, axis=0)
+        )
+
+        # Parabolic interpolation around the picked lag
+        columns = np.arange(search.shape[1])
+        inner = np.clip(lag_index, 1, len(search) - 2)
+        left = search[inner - 1, columns]
+        middle = search[inner, columns]
+        right = search[inner + 1, columns]
+        denominator = left - 2 * middle + right
+        # Flat troughs (denominator ~0) keep the integer lag, without dividing by 0
+        shift = np.divide(
+            0.5 * (left - right), denominator,
+            out=np.zeros_like(denominator), where=np.abs(denominator) > 1e-12
+        )
+        shift = np.where(inner == lag_index, np.clip(shift, -1, 1), 0.0)
+
+        lag = min_lag + lag_index + shift
+        confidence = np.clip(1 - search[lag_index, columns], 0, 1)
+
+        # Silent frames have no periodicity at all
+        silent = shifted_energy[0] < 1e-8
+        voiced = (search[lag_index, columns] < voicing_threshold) & ~silent
+
+        end = start + block.shape[1]
+        f0[start:end] = np.where(voiced, sr / lag, 0.0)
+        voiced_probs[start:end] = np.where(silent, 0.0, confidence)
+
+    return f0, voiced_probs
+
+PITCH_TRACKERS = {
+    'pyin': pyin_tracker,
+    'pyin_hum': pyin_hum_tracker,
+    'yin': yin_tracker,
+    'autocorr': autocorr_tracker,
+}
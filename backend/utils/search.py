@@ -0,0 +1,239 @@
+import heapq
+import math
+import numpy as np
+from utils.dtw import lb_kim, lb_keogh
+from utils.similarity import (
+    SimilarityMatcher,
+    DEFAULT_WEIGHTS,
+    GLOBAL_MODES,
+    PYRAMID_FACTORS,
+    distance_to_similarity,
+    similarity_to_distance
+)
+
+class CascadeSearch:
+    """
+    Top-k humming search with cheap filters in front of full DTW
+    Stages: length ratio (optional) -> LB_Kim -> LB_Keogh -> banded DTW
+    LB stages only drop songs whose best possible score is already below
+    the running k-th best, so they never change the ranking.
+    Full DTW gets the k-th best as a distance budget and abandons early.
+    The length-ratio filter is a heuristic and is off by default
+    (max_length_ratio=None): it drops songs whose interval sequence is more
+    than max_length_ratio times longer / shorter than the hum's, even ones
+    match_many would have ranked.
+    """
+    def __init__(self, matcher=None, top_k=5, max_length_ratio=None, weights=None):
+        self.matcher = matcher or SimilarityMatcher()
+        if self.matcher.dtw_backend != 'banded':
+            raise ValueError("CascadeSearch lower bounds require the 'banded' DTW backend")
+        if self.matcher.mode not in GLOBAL_MODES:
+            raise ValueError("CascadeSearch lower bounds require a global match mode")
+        self.top_k = top_k
+        self.max_length_ratio = max_length_ratio
+        self.weights = weights or DEFAULT_WEIGHTS
+        self.stats = {}
+
+    def search(self, query_features, catalog):
+        """
+        catalog: iterable of (key, features) pairs
+        Returns the top_k (key, total_score, display_scores), best first.
+        Per-stage pruning counters are left in self.stats
+        """
+        catalog = list(catalog)
+        stats = {
+            'candidates': len(catalog),
+            'length_ratio': 0,  # pruned by each stage
+            'lb_kim': 0,
+            'lb_keogh': 0,
+            'dtw': 0,           # full alignments actually run
+            'abandoned': 0      # ... of which stopped early by the budget
+        }
+        self.stats = stats
+
+        query = self.matcher.prepare(query_features)
+        q_intervals = query['intervals']
+        q_contour = query['contour']
+
+        # Stage 1: length ratio + LB_Kim (O(1) per song)
+        candidates = []
+        for index, (key, features) in enumerate(catalog):
+            reference = self.matcher.prepare(features)
+
+            if (self.max_length_ratio is not None and
+                    self._length_ratio(q_intervals, reference['intervals']) > self.max_length_ratio):
+                stats['length_ratio'] += 1
+                continue
+
+            bound = sum(self._upper_bounds(
+                q_intervals, reference['intervals'],
+                q_contour, reference['contour'],
+                lb_kim
+            ))
+            candidates.append((bound, index, key, reference))
+
+        # Most promising first, so the top-k threshold tightens quickly
+        candidates.sort(key=lambda c: (-c[0], c[1]))
+
+        # Min-heap of (score, -index): heap[0] is the current k-th best
+        heap = []
+        scored = {}
+
+        for bound, index, key, reference in candidates:
+            threshold = heap[0][0] if len(heap) >= self.top_k else -np.inf
+
+            if bound < threshold:
+                stats['lb_kim'] += 1
+                continue
+
+            # Stage 2: LB_Keogh against the band envelope
+            pitch_bound, contour_bound = self._upper_bounds(
+                q_intervals, reference['intervals'],
+                q_contour, reference['contour'],
+                lambda x, y: lb_keogh(x, y, self.matcher.band_ratio)
+            )
+            if pitch_bound + contour_bound < threshold:
+                stats['lb_keogh'] += 1
+                continue
+
+            # Stage 3: full DTW, abandoned once the song can't reach the top k
+            stats['dtw'] += 1
+            pitch_score = self.matcher.sequence_similarity(
+                q_intervals, reference['intervals'], self.matcher.pitch_scale,
+                max_dist=self._budget(
+                    threshold - contour_bound, self.weights['pitch'],
+                    q_intervals, reference['intervals'], self.matcher.pitch_scale
+                )
+            )
+            pitch_part = pitch_score * self.weights['pitch']
+            if pitch_part + contour_bound < threshold:
+                stats['abandoned'] += 1
+                continue
+
+            contour_score = self.matcher.sequence_similarity(
+                q_contour, reference['contour'], self.matcher.contour_scale,
+                max_dist=self._budget(
+                    threshold - pitch_part, self.weights['contour'],
+                    q_contour, reference['contour'], self.matcher.contour_scale
+                )
+            )
+            total = pitch_part + contour_score * self.weights['contour']
+            if total < threshold:
+                stats['abandoned'] += 1
+                continue
+
+            scored[index] = (key, total, pitch_score)
+
+            entry = (total, -index)
+            if len(heap) < self.top_k:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+
+        # Same ordering as match_many: score desc, catalog order for ties
+        ranked = sorted(heap, key=lambda e: (-e[0], -e[1]))
+
+        return [
+            (
+                scored[-neg_index][0],
+                float(total),
+                {'pitch': float(scored[-neg_index][2]), 'mfcc': 0.0, 'chroma': 0.0}
+            )
+            for total, neg_index in ranked
+        ]
+
+    def _length_ratio(self, seq1, seq2):
+        """Ratio of the longer to the shorter sequence"""
+        shorter = min(len(seq1), len(seq2))
+        if shorter < 5:
+            # Too short to align: scores 0 anyway, leave it to the LB stages
+            return 1.0
+        return max(len(seq1), len(seq2)) / shorter
+
+    def _budget(self, needed, weight, seq1, seq2, scale):
+        """
+        DTW distance budget for one component: the weighted score it must
+        still contribute (needed) converted back into a distance
+        """
+        if weight <= 0 or not np.isfinite(needed):
+            return np.inf
+        return similarity_to_distance(needed / weight, len(seq1), len(seq2), scale)
+
+    def _upper_bounds(self, intervals1, intervals2, contour1, contour2, lower_bound):
+        """
+        Best weighted (pitch, contour) scores a song could still reach,
+        given a DTW lower bound
+        """
+        pitch_bound = distance_to_similarity(
+            lower_bound(intervals1, intervals2),
+            len(intervals1), len(intervals2), self.matcher.pitch_scale
+        )
+        contour_bound = distance_to_similarity(
+            lower_bound(contour1, contour2),
+            len(contour1), len(contour2), self.matcher.contour_scale
+        )
+        return (
+            float(pitch_bound) * self.weights['pitch'],
+            float(contour_bound) * self.weights['contour']
+        )
+
+
+class CoarseToFineSearch:
+    """
+    Multi-resolution search over the PAA pyramid of the interval sequences
+    Ranks the whole catalog at the coarsest level, keeps the best
+    refine_ratio of it for the next finer level, and only scores the
+    final survivors at full resolution (same scores as match_many).
+    Lower refine_ratio = faster, but more chance to drop the right song.
+    """
+    def __init__(self, matcher=None, top_k=5, refine_ratio=0.1):
+        self.matcher = matcher or SimilarityMatcher()
+        if self.matcher.mode not in GLOBAL_MODES:
+            raise ValueError("CoarseToFineSearch requires a global match mode")
+        self.top_k = top_k
+        self.refine_ratio = refine_ratio
+        self.stats = {}
+
+    def search(self, query_features, catalog):
+        """
+        catalog: iterable of (key, features) pairs
+        Returns the top_k (key, total_score, display_scores), best first.
+        Candidates ranked at each level are left in self.stats
+        """
+        catalog = list(catalog)
+        query = self.matcher.prepare(query_features)
+        references = [self.matcher.prepare(features) for _, features in catalog]
+        survivors = np.arange(len(catalog))
+        self.stats = {'candidates': len(catalog)}
+
+        # Coarsest level first
+        for factor in sorted(PYRAMID_FACTORS, reverse=True):
+            key = f'intervals_paa{factor}'
+
+            # Hum too short to say anything at this resolution
+            if len(query[key]) < 5:
+                continue
+
+            keep = max(self.top_k, math.ceil(len(survivors) * self.refine_ratio))
+            if keep >= len(survivors):
+                continue
+
+            scores = self.matcher.score_many(
+                query[key],
+                [references[i][key] for i in survivors],
+                self.matcher.pitch_scale
+            )
+            self.stats[f'paa{factor}'] = len(survivors)
+
+            # Keep catalog order among survivors so ties break like match_many
+            best = np.argsort(-scores, kind='stable')[:keep]
+            survivors = np.sort(survivors[best])
+
+        self.stats['full'] = len(survivors)
+
+        results = self.matcher.match_many(
+            query,
+            [(i, references[i]) for i in survivors],
+            top_k=self.top_k
+        )
+        return [(catalog[i][0], total, scores) for i, total, scores in results]
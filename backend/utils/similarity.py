@@ -1,25 +1,189 @@
 import numpy as np
 from fastdtw import fastdtw
+from scipy.signal import medfilt
 from scipy.spatial.distance import euclidean
+from utils.dtw import (
+    dtw_distance,
+    dtw_distance_many,
+    pack_sequences,
+    subsequence_dtw,
+    subsequence_dtw_many
+)
+from utils.notes import transcribe_notes, note_intervals
+
+DTW_BACKENDS = ('banded', 'fastdtw')
+
+# 'global': whole hum vs whole stored sequence (chorus crops)
+# 'subsequence': whole hum vs best-matching region of a full-length track
+# 'notes': like 'global', on note events instead of pitch frames
+MATCH_MODES = ('global', 'subsequence', 'notes')
+
+# Modes that align whole sequences (lower bounds / PAA search apply)
+GLOBAL_MODES = ('global', 'notes')
+
+# Normalized DTW distance at which each score drops to 0%
+PITCH_DISTANCE_SCALE = 2.0
+CONTOUR_DISTANCE_SCALE = 1.5
+
+# Same for 'notes' mode: one std-normalized step per note (and a contour
+# that is rarely flat) sits ~3x / ~8x further apart than frame intervals,
+# which are mostly held notes. Calibrated on crops of stored songs so a
+# correct match scores about what it does in 'global' mode (one confidence
+# cutoff for every mode)
+NOTE_PITCH_DISTANCE_SCALE = 6.0
+NOTE_CONTOUR_DISTANCE_SCALE = 12.0
+
+# Piecewise aggregate approximation levels of the interval sequence
+# (stored as 'intervals_paa4', 'intervals_paa16'), finest first
+PYRAMID_FACTORS = (4, 16)
+
+# Frame selection before intervals: the least confident
+# VOICED_PROB_PERCENTILE % of each track's voiced frames are dropped, but a
+# frame at MIN_VOICED_PROB or above is always kept (pyin rates most voiced
+# frames of polyphonic recordings ~0.01, clean hums far higher). If fewer
+# than MIN_SELECTED_FRACTION of the voiced frames pass, all are kept.
+# Then median smoothing (frames) and the largest deviation from the
+# smoothed track (semitones) that isn't an octave / tracking error
+VOICED_PROB_PERCENTILE = 20
+MIN_VOICED_PROB = 0.5
+MIN_SELECTED_FRACTION = 0.5
+SMOOTHING_FRAMES = 5
+OUTLIER_SEMITONES = 5.0
+
+DEFAULT_WEIGHTS = {
+    'pitch': 0.80,     # Relative pitch intervals
+    'contour': 0.20,   # Melody shape
+}
+
+def distance_to_similarity(distance, len1, len2, scale):
+    """
+    Convert DTW distance(s) to a 0-100 similarity
+    Works on scalars or arrays; sequences shorter than 5 score 0
+    """
+    distance = np.asarray(distance, dtype=float)
+    len1 = np.asarray(len1, dtype=float)
+    len2 = np.asarray(len2, dtype=float)
+    
+    avg_length = np.maximum((len1 + len2) / 2, 1)
+    normalized_distance = distance / avg_length
+    similarity = np.maximum(0, 100 * (1 - np.minimum(normalized_distance / scale, 1)))
+    
+    return np.where((len1 < 5) | (len2 < 5), 0.0, similarity)
+
+def paa(sequence, factor):
+    """
+    Piecewise aggregate approximation: mean of every `factor` samples
+    (the last, shorter segment is averaged too)
+    """
+    sequence = np.asarray(sequence, dtype=float)
+    
+    if len(sequence) == 0 or factor <= 1:
+        return sequence
+    
+    starts = np.arange(0, len(sequence), factor)
+    sums = np.add.reduceat(sequence, starts)
+    counts = np.diff(np.append(starts, len(sequence)))
+    
+    return sums / counts
+
+def similarity_to_distance(min_similarity, len1, len2, scale):
+    """
+    Largest DTW distance that still scores at least min_similarity
+    (inverse of distance_to_similarity, used as an early-abandon budget)
+    """
+    if min_similarity <= 0:
+        return np.inf
+    
+    avg_length = max((len1 + len2) / 2, 1)
+    budget = avg_length * scale * (1 - min_similarity / 100)
+    
+    # Slack so float rounding never abandons a score that would tie
+    return budget * (1 + 1e-9) + 1e-9
 
 class SimilarityMatcher:
-    def __init__(self):
-        pass
+    def __init__(self, dtw_backend='banded', band_ratio=0.1, mode='global',
+                 sr=16000, hop_length=512):
+        if dtw_backend not in DTW_BACKENDS:
+            raise ValueError(f"Unknown DTW backend: {dtw_backend}")
+        if mode not in MATCH_MODES:
+            raise ValueError(f"Unknown match mode: {mode}")
+        self.dtw_backend = dtw_backend
+        self.band_ratio = band_ratio
+        self.mode = mode
+        # Distance scales of the interval / contour scores in this mode
+        if mode == 'notes':
+            self.pitch_scale = NOTE_PITCH_DISTANCE_SCALE
+            self.contour_scale = NOTE_CONTOUR_DISTANCE_SCALE
+        else:
+            self.pitch_scale = PITCH_DISTANCE_SCALE
+            self.contour_scale = CONTOUR_DISTANCE_SCALE
+        # Pitch frame rate (pyin hop), used to report matched time spans
+        self.sr = sr
+        self.hop_length = hop_length
+    
+    def dtw(self, seq1, seq2, dtw_backend=None, max_dist=np.inf):
+        """
+        DTW distance between two 1-D sequences
+        'banded' = compiled Sakoe-Chiba kernel, 'fastdtw' = legacy path
+        max_dist lets the banded kernel abandon early (returns inf)
+        """
+        backend = dtw_backend or self.dtw_backend
+        
+        if backend == 'fastdtw':
+            distance, _ = fastdtw(
+                seq1.reshape(-1, 1),
+                seq2.reshape(-1, 1),
+                dist=euclidean
+            )
+            return distance
+        
+        return dtw_distance(seq1, seq2, band_ratio=self.band_ratio, max_dist=max_dist)
+    
+    def select_frames(self, pitch, voiced_probs=None):
+        """
+        Frames that go into the interval sequence, and their smoothed pitch
+        Drops the track's least confident voiced frames (see
+        VOICED_PROB_PERCENTILE), median smooths the rest and drops jumps of
+        more than OUTLIER_SEMITONES away from the smoothed track (octave
+        errors, single-frame glitches)
+        Returns (frame indexes, semitones re A4)
+        """
+        pitch = np.asarray(pitch, dtype=float)
+        voiced = pitch > 0
+        keep = voiced
+        if voiced_probs is not None and len(voiced_probs) == len(pitch) and voiced.any():
+            voiced_probs = np.asarray(voiced_probs, dtype=float)
+            cutoff = min(MIN_VOICED_PROB, np.percentile(voiced_probs[voiced], VOICED_PROB_PERCENTILE))
+            confident = voiced & (voiced_probs >= cutoff)
+            if confident.sum() >= MIN_SELECTED_FRACTION * voiced.sum():
+                keep = confident
+        
+        frames = np.flatnonzero(keep)
+        semitones = 12 * np.log2(pitch[frames] / 440.0)  # Relative to A4
+        
+        if len(frames) >= SMOOTHING_FRAMES:
+            smoothed = medfilt(semitones, SMOOTHING_FRAMES)
+            inliers = np.abs(semitones - smoothed) <= OUTLIER_SEMITONES
+            frames, semitones = frames[inliers], smoothed[inliers]
+        
+        return frames.astype(np.int32), semitones
     
-    def pitch_to_relative(self, pitch):
+    def pitch_to_relative(self, pitch, voiced_probs=None):
         """
         Convert absolute pitch to RELATIVE intervals (Google Hum style)
         This makes it KEY-INVARIANT and TEMPO-INVARIANT
         """
-        # Remove unvoiced frames
-        voiced_pitch = pitch[pitch > 0]
-        
-        if len(voiced_pitch) < 5:
+        # Confident, smoothed voiced frames only
+        _, semitones = self.select_frames(pitch, voiced_probs)
+        return self.semitones_to_relative(semitones)
+    
+    def semitones_to_relative(self, semitones):
+        """
+        Intervals between consecutive selected frames, std-normalized
+        """
+        if len(semitones) < 5:
             return np.array([])
         
-        # Convert to semitones (log scale)
-        semitones = 12 * np.log2(voiced_pitch / 440.0)  # Relative to A4
-        
         # Calculate intervals (differences between consecutive notes)
         intervals = np.diff(semitones)
         
@@ -29,12 +193,16 @@ class SimilarityMatcher:
         
         return intervals
     
-    def melody_contour(self, pitch):
+    def melody_contour(self, pitch, voiced_probs=None):
         """
         Extract melody contour (shape): UP, DOWN, SAME
         """
-        intervals = self.pitch_to_relative(pitch)
-        
+        return self.intervals_to_contour(self.pitch_to_relative(pitch, voiced_probs))
+    
+    def intervals_to_contour(self, intervals):
+        """
+        Quantize relative intervals into a melody contour
+        """
         if len(intervals) == 0:
             return np.array([])
         
@@ -47,94 +215,131 @@ class SimilarityMatcher:
         
         return contour
     
-    def pitch_similarity(self, pitch1, pitch2):
+    def sequence_similarity(self, seq1, seq2, scale, dtw_backend=None, max_dist=np.inf):
         """
-        Compare melodies using RELATIVE PITCH (Google Hum approach)
+        DTW similarity (0-100) between two prepared sequences
+        (relative intervals or contours)
+        Scores 0 if the alignment is abandoned for exceeding max_dist
         """
-        # Convert to relative intervals
-        intervals1 = self.pitch_to_relative(pitch1)
-        intervals2 = self.pitch_to_relative(pitch2)
-        
-        if len(intervals1) < 5 or len(intervals2) < 5:
+        if len(seq1) < 5 or len(seq2) < 5:
             return 0.0
         
-        # DTW on intervals
         try:
-            distance, _ = fastdtw(
-                intervals1.reshape(-1, 1),
-                intervals2.reshape(-1, 1),
-                dist=euclidean
-            )
-            
-            # Normalize
-            avg_length = (len(intervals1) + len(intervals2)) / 2
-            normalized_distance = distance / avg_length
-            
-            # Convert to similarity (0-100)
-            similarity = max(0, 100 * (1 - min(normalized_distance / 2.0, 1)))
+            distance = self.dtw(seq1, seq2, dtw_backend, max_dist)
             
-            return similarity
+            # Normalize and convert to similarity (0-100)
+            return float(distance_to_similarity(
+                distance, len(seq1), len(seq2), scale
+            ))
         except:
             return 0.0
     
-    def contour_similarity(self, pitch1, pitch2):
+    def subsequence_similarity(self, query_seq, reference_seq, scale):
         """
-        Compare melody SHAPE (up/down/same pattern)
+        Similarity (0-100) of the whole query to its best-matching region
+        of the reference. Returns (score, start, end) in interval indexes
+        Always uses the compiled kernel
         """
-        contour1 = self.melody_contour(pitch1)
-        contour2 = self.melody_contour(pitch2)
+        if len(query_seq) < 5 or len(reference_seq) < 5:
+            return 0.0, 0, 0
         
-        if len(contour1) < 5 or len(contour2) < 5:
-            return 0.0
+        distance, start, end = subsequence_dtw(query_seq, reference_seq)
         
-        try:
-            distance, _ = fastdtw(
-                contour1.reshape(-1, 1),
-                contour2.reshape(-1, 1),
-                dist=euclidean
-            )
-            
-            avg_length = (len(contour1) + len(contour2)) / 2
-            normalized_distance = distance / avg_length
-            
-            similarity = max(0, 100 * (1 - min(normalized_distance / 1.5, 1)))
-            
-            return similarity
-        except:
-            return 0.0
+        # Normalize by the query and the matched region, like a global match
+        score = float(distance_to_similarity(
+            distance, len(query_seq), end - start + 1, scale
+        ))
+        return score, start, end
+    
+    def time_span(self, frames, start, end):
+        """
+        Convert an interval-index span to (start_sec, end_sec) in the track
+        frames: the prepared melody's 'frames' (interval k spans frames[k]
+        and frames[k + 1])
+        """
+        if len(frames) < 2:
+            return 0.0, 0.0
+        
+        start_frame = frames[min(start, len(frames) - 1)]
+        end_frame = frames[min(end + 1, len(frames) - 1)]
+        frame_seconds = self.hop_length / self.sr
+        
+        return float(start_frame * frame_seconds), float(end_frame * frame_seconds)
     
-    def combined_similarity(self, features1, features2, weights=None):
+    def pitch_similarity(self, pitch1, pitch2, dtw_backend=None):
+        """
+        Compare melodies using RELATIVE PITCH (Google Hum approach)
+        """
+        return self.sequence_similarity(
+            self.pitch_to_relative(pitch1),
+            self.pitch_to_relative(pitch2),
+            PITCH_DISTANCE_SCALE,
+            dtw_backend
+        )
+    
+    def contour_similarity(self, pitch1, pitch2, dtw_backend=None):
+        """
+        Compare melody SHAPE (up/down/same pattern)
+        """
+        return self.sequence_similarity(
+            self.melody_contour(pitch1),
+            self.melody_contour(pitch2),
+            CONTOUR_DISTANCE_SCALE,
+            dtw_backend
+        )
+    
+    def combined_similarity(self, features1, features2, weights=None, dtw_backend=None):
         """
         MELODY-ONLY MATCHING (Google Hum approach)
         Only uses PITCH - ignores MFCC/Chroma
+        dtw_backend overrides the matcher default ('banded' or 'fastdtw')
+        In 'subsequence' mode display_scores also gets the matched
+        (start_sec, end_sec) span of features2 under 'span'
         """
         if weights is None:
-            weights = {
-                'pitch': 0.80,     # Relative pitch intervals
-                'contour': 0.20,   # Melody shape
-            }
+            weights = DEFAULT_WEIGHTS
         
         scores = {}
         
-        # Calculate pitch similarity (relative)
-        try:
-            scores['pitch'] = self.pitch_similarity(
-                features1['pitch'],
-                features2['pitch']
-            )
-        except Exception as e:
-            print(f"    ⚠️ Pitch error: {e}")
-            scores['pitch'] = 0.0
+        # Intervals + contour (precomputed at ingest for stored songs)
+        melody1 = self.prepare(features1)
+        melody2 = self.prepare(features2)
         
-        # Calculate contour similarity (shape)
-        try:
-            scores['contour'] = self.contour_similarity(
-                features1['pitch'],
-                features2['pitch']
+        span = None
+        
+        if self.mode == 'subsequence':
+            # Best-matching region of a full-length track
+            scores['pitch'], start, end = self.subsequence_similarity(
+                melody1['intervals'], melody2['intervals'], self.pitch_scale
+            )
+            scores['contour'], _, _ = self.subsequence_similarity(
+                melody1['contour'], melody2['contour'], self.contour_scale
             )
-        except Exception as e:
-            print(f"    ⚠️ Contour error: {e}")
-            scores['contour'] = 0.0
+            span = self.time_span(melody2['frames'], start, end)
+        else:
+            # Calculate pitch similarity (relative)
+            try:
+                scores['pitch'] = self.sequence_similarity(
+                    melody1['intervals'],
+                    melody2['intervals'],
+                    self.pitch_scale,
+                    dtw_backend
+                )
+            except Exception as e:
+                print(f"    ⚠️ Pitch error: {e}")
+                scores['pitch'] = 0.0
+        
+            # Calculate contour similarity (shape)
+            try:
+                scores['contour'] = self.sequence_similarity(
+                    melody1['contour'],
+                    melody2['contour'],
+                    self.contour_scale,
+                    dtw_backend
+                )
+            except Exception as e:
+                print(f"    ⚠️ Contour error: {e}")
+                scores['contour'] = 0.0
         
         print(f"    Pitch (intervals): {scores['pitch']:.1f}% | Contour (shape): {scores['contour']:.1f}%")
         
@@ -151,4 +356,149 @@ class SimilarityMatcher:
             'chroma': 0.0  # Not used anymore
         }
         
-        return total_score, display_scores
\ No newline at end of file
+        if span is not None:
+            display_scores['span'] = span
+        
+        return total_score, display_scores
+    
+    def prepare(self, features):
+        """
+        Melody representation used for matching: intervals + contour,
+        plus the PAA pyramid of the intervals for coarse-to-fine search
+        and the pitch frame of each interval step ('frames', for spans)
+        Uses the ones stored at ingest when present, otherwise derives them
+        from pitch (once per query instead of once per (query, song) pair)
+        In 'notes' mode the sequences are note intervals (features['notes']);
+        a melody already prepared (no pitch / notes) is used as it is
+        """
+        if self.mode == 'notes' and 'notes' not in features and 'pitch' not in features:
+            # Already prepared in notes mode (CoarseToFineSearch -> match_many,
+            # pool workers): the sequences are note intervals
+            melody = {
+                'intervals': features['intervals'],
+                'contour': features['contour']
+            }
+        elif self.mode == 'notes':
+            notes = features['notes'] if 'notes' in features else transcribe_notes(
+                features['pitch'], self.sr, self.hop_length
+            )
+            intervals = note_intervals(notes)
+            melody = {
+                'intervals': intervals,
+                'contour': self.intervals_to_contour(intervals)
+            }
+        elif 'intervals' in features and 'contour' in features:
+            # Precomputed at ingest time, or an already prepared melody
+            # (pool workers only get intervals + contour; frames are only
+            # needed for subsequence spans)
+            melody = {
+                'intervals': features['intervals'],
+                'contour': features['contour']
+            }
+            if 'frames' in features:
+                melody['frames'] = features['frames']
+            elif 'pitch' in features:
+                # Older ingests kept every voiced frame
+                melody['frames'] = np.flatnonzero(features['pitch'] > 0).astype(np.int32)
+        else:
+            frames, semitones = self.select_frames(features['pitch'], features.get('voiced_probs'))
+            intervals = self.semitones_to_relative(semitones)
+            melody = {
+                'intervals': intervals,
+                'contour': self.intervals_to_contour(intervals),
+                'frames': frames
+            }
+        
+        for factor in PYRAMID_FACTORS:
+            key = f'intervals_paa{factor}'
+            stored = key in features and self.mode != 'notes'
+            melody[key] = features[key] if stored else paa(melody['intervals'], factor)
+        
+        return melody
+    
+    def match_many(self, query_features, catalog, top_k=5, weights=None):
+        """
+        Score one query against a whole catalog in a single batched pass
+        catalog: iterable of (key, features) pairs
+        Returns the top_k (key, total_score, display_scores), best first
+        """
+        if weights is None:
+            weights = DEFAULT_WEIGHTS
+        
+        catalog = list(catalog)
+        if len(catalog) == 0:
+            return []
+        
+        query = self.prepare(query_features)
+        references = [self.prepare(features) for _, features in catalog]
+        
+        if self.mode == 'subsequence':
+            pitch_scores, starts, ends = self._subsequence_many(
+                query['intervals'],
+                [ref['intervals'] for ref in references],
+                self.pitch_scale
+            )
+            contour_scores, _, _ = self._subsequence_many(
+                query['contour'],
+                [ref['contour'] for ref in references],
+                self.contour_scale
+            )
+        else:
+            pitch_scores = self.score_many(
+                query['intervals'],
+                [ref['intervals'] for ref in references],
+                self.pitch_scale
+            )
+            contour_scores = self.score_many(
+                query['contour'],
+                [ref['contour'] for ref in references],
+                self.contour_scale
+            )
+        
+        totals = pitch_scores * weights['pitch'] + contour_scores * weights['contour']
+        
+        # Stable sort keeps catalog order for ties
+        order = np.argsort(-totals, kind='stable')[:top_k]
+        
+        results = []
+        for i in order:
+            display_scores = {'pitch': float(pitch_scores[i]), 'mfcc': 0.0, 'chroma': 0.0}
+            if self.mode == 'subsequence':
+                display_scores['span'] = self.time_span(
+                    references[i]['frames'], starts[i], ends[i]
+                )
+            results.append((catalog[i][0], float(totals[i]), display_scores))
+        
+        return results
+    
+    def score_many(self, query_seq, reference_seqs, scale):
+        """Similarity of one query sequence to many reference sequences"""
+        lengths = np.array([len(seq) for seq in reference_seqs])
+        
+        if len(query_seq) < 5:
+            return np.zeros(len(reference_seqs))
+        
+        if self.dtw_backend == 'banded':
+            flat, offsets = pack_sequences(reference_seqs)
+            distances = dtw_distance_many(query_seq, flat, offsets, self.band_ratio)
+        else:
+            distances = np.array([
+                self.dtw(query_seq, seq) if len(seq) >= 5 else np.inf
+                for seq in reference_seqs
+            ])
+        
+        return distance_to_similarity(distances, len(query_seq), lengths, scale)
+    
+    def _subsequence_many(self, query_seq, reference_seqs, scale):
+        """
+        Subsequence similarity of one query inside many references
+        Returns (scores, starts, ends)
+        """
+        lengths = np.array([len(seq) for seq in reference_seqs])
+        flat, offsets = pack_sequences(reference_seqs)
+        distances, starts, ends = subsequence_dtw_many(query_seq, flat, offsets)
+        
+        scores = distance_to_similarity(distances, len(query_seq), ends - starts + 1, scale)
+        scores = np.where(lengths < 5, 0.0, scores)
+        
+        return scores, starts, ends
@@ -0,0 +1,133 @@
+import numpy as np
+import soundfile as sf
+import soxr
+from scipy import signal
+from utils.audio_processor import highpass_sos
+from utils.pitch_tracker import track_pitch, PITCH_TRACKERS, FRAME_LENGTH, HOP_LENGTH
+from utils.notes import transcribe_notes
+from utils.similarity import SimilarityMatcher
+
+class MelodyStream:
+    """
+    Bounded-memory pitch / interval / contour extraction for long audio
+    The file is read in native-rate blocks, resampled and high-passed with
+    carried filter state, and tracked block by block on the same frame grid
+    as a whole-file center=True run; memory depends on block_seconds only
+    """
+    def __init__(self, sr=16000, pitch_tracker='pyin', block_seconds=30.0, read_frames=65536):
+        if pitch_tracker not in PITCH_TRACKERS:
+            raise ValueError(f"Unknown pitch tracker: {pitch_tracker}")
+        self.sr = sr
+        self.pitch_tracker = pitch_tracker
+        self.read_frames = read_frames
+        self.matcher = SimilarityMatcher()
+
+        # Pitch frames per tracked block, and the samples they span
+        self.block_frames = max(1, int(block_seconds * sr / HOP_LENGTH))
+        self.block_samples = (self.block_frames - 1) * HOP_LENGTH + FRAME_LENGTH
+
+    def chunks(self, path):
+        """
+        Yield one dict per block: start_frame, pitch, voiced_probs,
+        intervals and contour (intervals continue across blocks and are
+        scaled by the running interval std, so early blocks are approximate)
+        """
+        info = sf.info(path)
+        resampler = None
+        if info.samplerate != self.sr:
+            resampler = soxr.ResampleStream(info.samplerate, self.sr, 1, dtype='float32')
+
+        sos = highpass_sos(self.sr)
+        self._zi = np.zeros((sos.shape[0], 2))
+        self._last_semitone = None
+        self._count, self._mean, self._m2 = 0, 0.0, 0.0
+
+        # Leading zeros = librosa's center=True padding
+        buffer = np.zeros(FRAME_LENGTH // 2, dtype=np.float32)
+        start_frame = 0
+        total_samples = 0
+
+        blocks = sf.blocks(path, blocksize=self.read_frames, dtype='float32', always_2d=True)
+        for block in blocks:
+            samples = self._filter(block.mean(axis=1), resampler, sos)
+            total_samples += len(samples)
+            buffer = np.concatenate([buffer, samples])
+
+            # Consecutive blocks overlap by FRAME_LENGTH - HOP_LENGTH samples
+            while len(buffer) >= self.block_samples:
+                yield self._track(buffer[:self.block_samples], start_frame)
+                buffer = buffer[self.block_frames * HOP_LENGTH:]
+                start_frame += self.block_frames
+
+        if resampler is not None:
+            samples = self._filter(np.zeros(0, dtype=np.float32), resampler, sos, last=True)
+            total_samples += len(samples)
+            buffer = np.concatenate([buffer, samples])
+
+        # Trailing padding, then whatever frames the whole-file grid has left
+        remaining = 1 + total_samples // HOP_LENGTH - start_frame
+        if remaining > 0:
+            buffer = np.concatenate([buffer, np.zeros(FRAME_LENGTH // 2, dtype=np.float32)])
+            yield self._track(buffer[:(remaining - 1) * HOP_LENGTH + FRAME_LENGTH], start_frame)
+
+    def extract_melody(self, path):
+        """Concatenated pitch / voiced_probs + notes, same keys as the 'melody' profile"""
+        pitch, voiced_probs = [], []
+        for chunk in self.chunks(path):
+            pitch.append(chunk['pitch'])
+            voiced_probs.append(chunk['voiced_probs'])
+
+        pitch = np.concatenate(pitch) if pitch else np.array([])
+        return {
+            'pitch': pitch,
+            'voiced_probs': np.concatenate(voiced_probs) if voiced_probs else np.array([]),
+            'notes': transcribe_notes(pitch, self.sr, HOP_LENGTH)
+        }
+
+    def _filter(self, samples, resampler, sos, last=False):
+        """Resample and high-pass one block, carrying state to the next"""
+        if resampler is not None:
+            samples = resampler.resample_chunk(samples, last=last)
+        filtered, self._zi = signal.sosfilt(sos, samples, zi=self._zi)
+        return filtered.astype(np.float32)
+
+    def _track(self, samples, start_frame):
+        """Pitch-track one pre-framed block and continue the interval stream"""
+        f0, voiced_probs = track_pitch(samples, self.sr, self.pitch_tracker, center=False)
+
+        # Same confidence / smoothing / outlier selection as whole-file matching
+        _, semitones = self.matcher.select_frames(f0, voiced_probs)
+        if self._last_semitone is not None:
+            semitones = np.concatenate([[self._last_semitone], semitones])
+        if len(semitones) > 0:
+            self._last_semitone = semitones[-1]
+
+        intervals = np.diff(semitones)
+        self._update_std(intervals)
+        std = self.std
+        if std > 0:
+            intervals = intervals / std
+
+        return {
+            'start_frame': start_frame,
+            'pitch': f0,
+            'voiced_probs': voiced_probs,
+            'intervals': intervals,
+            'contour': self.matcher.intervals_to_contour(intervals)
+        }
+
+    def _update_std(self, values):
+        """Merge a block into the running interval mean / variance (Chan et al.)"""
+        if len(values) == 0:
+            return
+        count = self._count + len(values)
+        mean = float(np.mean(values))
+        delta = mean - self._mean
+        self._m2 += float(np.sum((values - mean) ** 2)) + delta ** 2 * self._count * len(values) / count
+        self._mean += delta * len(values) / count
+        self._count = count
+
+    @property
+    def std(self):
+        """Std of all intervals streamed so far"""
+        return float(np.sqrt(self._m2 / self._count)) if self._count > 0 else 0.0